@@ -0,0 +1,90 @@
+# Ricochet Robots batch engine
+
+# Moves robots on many boards at once with NumPy, for simulating thousands
+# of games in lockstep. The boards all have the same size and robots, but
+# their own walls and robot positions. Cell (x, y) is x + y*w, as in a
+# BitBoard, and every move follows the same rules as Board.move.
+#
+# NumPy is optional: this module imports without it, but a BatchBoard
+# can't be made.
+
+from board import DIRECTIONS
+from bitboard import BitBoard
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+
+
+class BatchBoard(object):
+
+    def __init__(self, boards):
+        # Take the walls and robot positions from a list of Boards
+        if numpy is None:
+            raise ImportError('the batch engine needs NumPy')
+        board = boards[0]
+        self.size = w, h = board.size
+        self.colors = board.colors
+        self.nboards = len(boards)
+        self.ncells = w * h
+        self.deltas = numpy.array([-w, w, -1, 1])
+        bitboards = [BitBoard.from_board(b) for b in boards]
+        # stops[b, cell, d] is where a robot at cell on board b stops moving
+        # in direction d if there are no other robots in the way
+        self.stops = numpy.array([bb.stops for bb in bitboards], dtype=numpy.int32).transpose(0, 2, 1).copy()
+        # robots[b, i] is the cell robot number i is at on board b
+        self.robots = numpy.array([bb.robots for bb in bitboards], dtype=numpy.int32)
+        self.index = numpy.arange(self.nboards)
+
+
+    def robot_number(self, color):
+        return self.colors.index(color)
+
+
+    def direction_number(self, direction):
+        return DIRECTIONS.index(direction)
+
+
+    def move(self, robot, direction):
+        # Move one robot in one direction on every board. robot and direction
+        # are either numbers (see robot_number() and direction_number()), or
+        # arrays of them with one per board. Return an array saying which
+        # boards had a robot actually move.
+        index = self.index
+        robots = self.robots
+        w = self.size[0]
+        robot = numpy.broadcast_to(robot, (self.nboards,))
+        direction = numpy.broadcast_to(direction, (self.nboards,))
+        start = robots[index, robot]
+        end = self.stops[index, start, direction]
+        delta = self.deltas[direction]
+        sign = numpy.sign(delta)
+        horizontal = (direction >= 2)
+        row = start // w
+        column = start % w
+        # Stop short of the nearest robot in the way. A robot is in the way
+        # if it's in the same row or column, past the start and no further
+        # than where this one would stop so far.
+        for j in range(robots.shape[1]):
+            other = robots[:, j]
+            line = numpy.where(horizontal, other // w == row, other % w == column)
+            blocked = (line & (robot != j) &
+                       ((other - start) * sign > 0) & ((end - other) * sign >= 0))
+            end = numpy.where(blocked, other - delta, end)
+        robots[index, robot] = end
+        return end != start
+
+
+    def at(self, robot, cells):
+        # Return an array saying which boards have the given robot (a number
+        # or an array of them) on the given cell (likewise)
+        return self.robots[self.index, numpy.broadcast_to(robot, (self.nboards,))] == cells
+
+
+    def positions(self, b):
+        # Return the robot positions on board number b, keyed by color
+        w = self.size[0]
+        return dict([(color, (int(cell) % w, int(cell) // w))
+                     for color, cell in zip(self.colors, self.robots[b])])
@@ -0,0 +1,219 @@
+# Ricochet Robots benchmarks
+
+# Times how long the headless modules take to import, and the hot paths
+# (moving robots, randomizing boards, solving and animating) on boards from
+# 16x16 up to 64x64. Everything is seeded, so the same work is done on every
+# run and the numbers can be compared between runs. Each benchmark is
+# repeated and the best time is reported.
+#
+#   python bench.py [--sizes 16 32 64] [--seed 1] [--repeat 3] [--quick]
+
+import sys
+import time
+import random
+
+from board import Board, DIRECTIONS
+from bitboard import BitBoard
+from generator import generate
+from solver import Solver
+from ricochet import slide_step, CELLS_PER_SECOND, FRAMES_PER_SECOND
+
+
+DEFAULT_SIZES = (16, 32, 64)
+DEFAULT_SEED = 1
+DEFAULT_REPEAT = 3
+
+MOVES = 100000
+BOARDS = 200
+CORPUS = 20
+SOLVE_DEPTH = 8
+FRAMES = 100000
+BATCH = 1000
+BATCH_MOVES = 100
+
+
+
+def best_time(func, repeat):
+    # Run func() repeat times. Return the shortest time and the last result.
+    best = None
+    for i in range(repeat):
+        start = time.time()
+        result = func()
+        elapsed = time.time() - start
+        if best is None or elapsed < best:
+            best = elapsed
+    return best, result
+
+
+def random_moves(board, n, seed):
+    # Return a fixed list of n (color, direction) moves
+    rng = random.Random(seed)
+    return [(rng.choice(board.colors), rng.choice(DIRECTIONS)) for i in range(n)]
+
+
+
+# The benchmarks. Each one returns a list of (name, value, unit) results.
+
+def bench_moves(size, seed, repeat, scale):
+    board = Board(size, seed=seed)
+    moves = random_moves(board, int(MOVES * scale), seed)
+    def run_board():
+        board.reset_robots()
+        del board.moves[:]
+        for color, direction in moves:
+            board.move(color, direction)
+    bitboard = BitBoard.from_board(board)
+    start = bitboard.robots, bitboard.occupied
+    def run_bitboard():
+        bitboard.robots, bitboard.occupied = start
+        for color, direction in moves:
+            bitboard.move(color, direction)
+    board.get_stops() # Don't count building the stop tables
+    t1, result = best_time(run_board, repeat)
+    t2, result = best_time(run_bitboard, repeat)
+    return [('Board.move', len(moves) / t1, 'moves/s'),
+            ('BitBoard.move', len(moves) / t2, 'moves/s')]
+
+
+def bench_randomize(size, seed, repeat, scale):
+    n = max(int(BOARDS * scale), 1)
+    board = Board(size, seed=seed)
+    def run_randomize():
+        board.random.seed(seed)
+        for i in range(n):
+            board.randomize()
+    def run_stops():
+        board.random.seed(seed)
+        for i in range(n):
+            board.randomize()
+            board.get_stops()
+    t1, result = best_time(run_randomize, repeat)
+    t2, result = best_time(run_stops, repeat)
+    t3, result = best_time(lambda: generate(n, seed, size), repeat)
+    return [('Board.randomize', n / t1, 'boards/s'),
+            ('randomize + stop tables', n / t2, 'boards/s'),
+            ('generator.generate', n / t3, 'boards/s')]
+
+
+def bench_solve(size, seed, repeat, scale):
+    # A fixed corpus of boards and goals, solved up to SOLVE_DEPTH moves
+    rng = random.Random(seed)
+    corpus = []
+    for i in range(max(int(CORPUS * scale), 1)):
+        board = Board(size, seed=rng.getrandbits(32))
+        corpus.append((board, rng.choice(sorted(board.targets))))
+    def run_solve():
+        nodes = solved = moves = 0
+        for board, goal in corpus:
+            solver = Solver(board)
+            solution = solver.solve(goal, max_depth=SOLVE_DEPTH)
+            nodes += solver.nodes
+            if solution is not None:
+                solved += 1
+                moves += len(solution)
+        return nodes, solved, moves
+    def run_distances():
+        found = 0
+        for board, goal in corpus:
+            found += len(Solver(board).distances(4))
+        return found
+    t1, (nodes, solved, moves) = best_time(run_solve, repeat)
+    t2, found = best_time(run_distances, repeat)
+    return [('solve nodes', nodes / t1, 'nodes/s'),
+            ('time to optimal', 1000 * t1 / len(corpus), 'ms/board'),
+            ('solved within %d moves' % SOLVE_DEPTH, solved, 'of %d (%d moves)' % (len(corpus), moves)),
+            ('distances(4)', 1000 * t2 / len(corpus), 'ms/board')]
+
+
+def bench_frames(size, seed, repeat, scale):
+    # The per-frame arithmetic of sliding a robot across the board, without
+    # any drawing
+    n = int(FRAMES * scale)
+    d = CELLS_PER_SECOND / FRAMES_PER_SECOND
+    w = size[0]
+    def run_frames():
+        curpos = [0.0, 0.0]
+        for i in range(n):
+            pos = (w - 1, 0) if curpos[0] == 0.0 else (0, 0)
+            slide_step(curpos, pos, d)
+    t, result = best_time(run_frames, repeat)
+    return [('slide_step', 1e6 * t / n, 'us/frame')]
+
+
+def bench_batch(size, seed, repeat, scale):
+    # The same random moves on many boards at once. This needs NumPy.
+    try:
+        from batch import BatchBoard
+    except ImportError:
+        return []
+    try:
+        batch = BatchBoard([Board(size, seed=seed + i) for i in range(max(int(BATCH * scale), 1))])
+    except ImportError:
+        return []
+    moves = random_moves(batch, BATCH_MOVES, seed)
+    moves = [(batch.robot_number(color), batch.direction_number(direction)) for color, direction in moves]
+    start = batch.robots.copy()
+    def run_batch():
+        batch.robots[:] = start
+        for robot, direction in moves:
+            batch.move(robot, direction)
+    t, result = best_time(run_batch, repeat)
+    return [('BatchBoard.move', batch.nboards * len(moves) / t, 'moves/s')]
+
+
+BENCHMARKS = [bench_moves, bench_randomize, bench_solve, bench_frames, bench_batch]
+
+
+# How long it takes a fresh interpreter to import the modules that don't
+# need a display, and whether any of them pulled in Tk
+
+STARTUP_MODULES = ('board', 'bitboard', 'solver', 'generator', 'library', 'verify', 'ricochet')
+STARTUP_SCRIPT = '''
+import sys, time
+start = time.time()
+import %s
+elapsed = time.time() - start
+print('%%f %%d' %% (elapsed, 'tkinter' in sys.modules or 'Tkinter' in sys.modules))
+'''
+
+def bench_startup(repeat):
+    import os
+    import subprocess
+    here = os.path.dirname(os.path.abspath(__file__))
+    results = []
+    for module in STARTUP_MODULES:
+        best = None
+        for i in range(repeat):
+            output = subprocess.check_output([sys.executable, '-c', STARTUP_SCRIPT % module], cwd=here)
+            elapsed, tk = output.split()
+            if best is None or float(elapsed) < best:
+                best = float(elapsed)
+        results.append(('import %s' % module, 1000 * best, 'ms' + (' (loaded Tk!)' if int(tk) else '')))
+    return results
+
+
+
+def main(sizes=DEFAULT_SIZES, seed=DEFAULT_SEED, repeat=DEFAULT_REPEAT, scale=1.0,
+         out=sys.stdout):
+    out.write('startup\n')
+    for name, value, unit in bench_startup(repeat):
+        out.write('  %-28s %12.1f %s\n' % (name, value, unit))
+    for n in sizes:
+        size = (n, n)
+        out.write('%dx%d\n' % size)
+        for bench in BENCHMARKS:
+            for name, value, unit in bench(size, seed, repeat, scale):
+                out.write('  %-28s %12.1f %s\n' % (name, value, unit))
+            out.flush()
+
+
+if __name__ == '__main__':
+    import argparse
+    parser = argparse.ArgumentParser(description='Benchmark the Ricochet Robots hot paths.')
+    parser.add_argument('--sizes', type=int, nargs='+', default=DEFAULT_SIZES,
+                        help='board widths to run at (boards are square)')
+    parser.add_argument('--seed', type=int, default=DEFAULT_SEED)
+    parser.add_argument('--repeat', type=int, default=DEFAULT_REPEAT)
+    parser.add_argument('--quick', action='store_true', help='do a tenth of the work')
+    args = parser.parse_args()
+    main(args.sizes, args.seed, args.repeat, 0.1 if args.quick else 1.0)
@@ -0,0 +1,197 @@
+# Ricochet Robots bitboard
+
+# An integer bitmask version of a board. Cell (x, y) is bit number x + y*w,
+# so moving up, down, left and right means subtracting or adding w or 1.
+# Robots are a tuple of cell numbers plus one occupancy mask, and each
+# direction has a mask of the cells with a wall on that side, which makes
+# it cheap to copy, hash and slide robots around during a search.
+
+from board import Board, DIRECTIONS
+
+
+
+def wall_masks(size, walls):
+    # Given walls in the doubled coordinates a Board uses, return a list of
+    # four masks of the cells with a wall on their up, down, left and right
+    # side. Cell (x, y) is bit number x + y*w.
+    w, h = size
+    masks = [0, 0, 0, 0]
+    def bit(x, y):
+        if (0 <= x < w) and (0 <= y < h):
+            return 1 << (x + y*w)
+        return 0
+    for x, y in walls:
+        if x % 2:
+            # Wall between two cells in the same row
+            masks[3] |= bit((x-1)//2, y//2)
+            masks[2] |= bit((x+1)//2, y//2)
+        else:
+            # Wall between two cells in the same column
+            masks[1] |= bit(x//2, (y-1)//2)
+            masks[0] |= bit(x//2, (y+1)//2)
+    return masks
+
+
+def wall_positions(size, masks):
+    # The reverse of wall_masks(): return a sorted list of the walls, in
+    # doubled coordinates, given the four masks.
+    w = size[0]
+    walls = set()
+    for d, (dx, dy) in enumerate([(0, -1), (0, 1), (-1, 0), (1, 0)]):
+        mask = masks[d]
+        while mask:
+            low = mask & -mask
+            cell = low.bit_length() - 1
+            x, y = cell % w, cell // w
+            walls.add((2*x+dx, 2*y+dy))
+            mask ^= low
+    return sorted(walls)
+
+
+
+class BitBoard(object):
+
+    def __init__(self, size, colors, objects, walls, robots, targets, center_positions):
+        # walls, robots, targets and center_positions are in the same form
+        # as the attributes of the same names on a Board.
+        self.size = w, h = size
+        self.colors = colors
+        self.objects = objects
+        self.ncells = n = w * h
+        self.full = (1 << n) - 1
+        self.deltas = (-w, w, -1, 1)
+        # Masks of the cells with a wall on their up, down, left and right side
+        self.walls = wall_masks(size, walls)
+        self.center = 0
+        for pos in center_positions:
+            self.center |= self.bit(pos)
+        self.robots = tuple([self.cell(robots[color]) for color in colors])
+        self.occupied = 0
+        for cell in self.robots:
+            self.occupied |= 1 << cell
+        self.targets = {}
+        for key, pos in targets.items():
+            self.targets[key] = self.cell(pos)
+        self.update_walls()
+
+
+    @classmethod
+    def from_board(cls, board):
+        # Make a bitboard out of a Board
+        return cls(board.size, board.colors, board.objects, board.walls,
+                   board.robots, board.targets, board.center_positions)
+
+
+    def to_board(self, seed=None):
+        # Make a Board out of this bitboard
+        board = Board(self.size, self.colors, self.objects, seed, randomize=False)
+        board.set_positions(self.wall_positions(), self.robot_positions(), self.target_positions())
+        return board
+
+
+
+    # Conversions
+
+
+    def cell(self, pos):
+        # Convert an (x, y) position into a cell number, or None if it isn't
+        # on the board.
+        x, y = pos
+        if (0 <= x < self.size[0]) and (0 <= y < self.size[1]):
+            return x + y * self.size[0]
+
+    def bit(self, pos):
+        # Return the mask of the cell at pos, or 0 if it isn't on the board
+        cell = self.cell(pos)
+        return 0 if cell is None else (1 << cell)
+
+    def pos(self, cell):
+        # Convert a cell number into an (x, y) position
+        return (cell % self.size[0], cell // self.size[0])
+
+    def cells(self, mask):
+        # Iterate over the cell numbers set in a mask
+        while mask:
+            low = mask & -mask
+            yield low.bit_length() - 1
+            mask ^= low
+
+    def wall_positions(self):
+        # Return the walls in the doubled coordinates a Board uses
+        return wall_positions(self.size, self.walls)
+
+    def robot_positions(self):
+        # Return the robot positions, keyed by color
+        return dict(zip(self.colors, map(self.pos, self.robots)))
+
+    def target_positions(self):
+        # Return the target positions, keyed by (color, object)
+        return dict([(key, self.pos(cell)) for key, cell in self.targets.items()])
+
+
+
+    # Sliding
+
+
+    def update_walls(self):
+        # Work out, for every cell and direction, which cells a robot would
+        # pass through and where it would stop if there were no other robots.
+        w, h = self.size
+        n = self.ncells
+        row = (1 << w) - 1
+        left_column = 0
+        for y in range(h):
+            left_column |= 1 << (y * w)
+        right_column = left_column << (w - 1)
+        # Cells that can't take a single step in each direction
+        self.blocked = [
+            self.walls[0] | row | ((self.center << w) & self.full),
+            self.walls[1] | (row << (n - w)) | (self.center >> w),
+            self.walls[2] | left_column | ((self.center << 1) & ~left_column),
+            self.walls[3] | right_column | ((self.center >> 1) & ~right_column),
+            ]
+        self.stops = []
+        self.rays = []
+        for d in range(4):
+            delta = self.deltas[d]
+            blocked = self.blocked[d]
+            stops = [0] * n
+            rays = [0] * n
+            # Visit the cells starting from the far side, so that the next
+            # cell over has always been done already.
+            for cell in (range(n-1, -1, -1) if delta > 0 else range(n)):
+                if blocked >> cell & 1:
+                    stops[cell] = cell
+                else:
+                    stops[cell] = stops[cell + delta]
+                    rays[cell] = rays[cell + delta] | (1 << (cell + delta))
+            self.stops.append(stops)
+            self.rays.append(rays)
+
+
+    def slide(self, cell, d, occupied=None):
+        # Return the cell that a robot at the given cell would stop at if it
+        # moved in direction number d, given the mask of occupied cells.
+        if occupied is None:
+            occupied = self.occupied
+        blockers = self.rays[d][cell] & occupied
+        if not blockers:
+            return self.stops[d][cell]
+        if self.deltas[d] > 0:
+            # Stop just before the nearest robot, which is the lowest bit
+            return (blockers & -blockers).bit_length() - 1 - self.deltas[d]
+        # Stop just after the nearest robot, which is the highest bit
+        return blockers.bit_length() - 1 - self.deltas[d]
+
+
+    def move(self, color, direction):
+        # Move the robot given by "color" in the direction given by "direction".
+        # Return True if the robot actually moved
+        i = self.colors.index(color)
+        cell = self.robots[i]
+        end = self.slide(cell, DIRECTIONS.index(direction))
+        if end == cell:
+            return False
+        self.robots = self.robots[:i] + (end,) + self.robots[i+1:]
+        self.occupied ^= (1 << cell) | (1 << end)
+        return True
@@ -0,0 +1,521 @@
+# Ricochet Robots game board
+
+# This module holds the rules of the game (walls, robots, targets, moves,
+# the undo/redo stack and the goal check) with no dependency on Tk, so that
+# boards can be created, played and solved without a display.
+
+import random
+from array import array
+
+
+DEFAULT_BOARD_SIZE = (16, 16)
+DEFAULT_DELAY_SECONDS = 30 # How long bidding stays open after the first bid
+
+COLORS = ('red', 'yellow', 'green', 'blue')
+# Colors for the fifth to eighth robots, for variants with more than four
+ALL_COLORS = COLORS + ('purple', 'orange', 'cyan', 'magenta')
+OBJECTS = ('square', 'circle', 'triangle', 'diamond')
+
+DIRECTIONS = ('up', 'down', 'left', 'right')
+STEPS = {
+    'up'   : ( 0, -1),
+    'down' : ( 0,  1),
+    'left' : (-1,  0),
+    'right': ( 1,  0),
+    }
+
+# The cells that randomize() places things on, and which of their
+# neighbors it tries to keep clear, keyed by board size and how many things
+# there are to place. They're the same for every board of the same kind,
+# so they're only worked out once.
+FREE_POINTS = {}
+
+
+
+def edge_positions(length):
+    # Return where the walls sticking in from one edge of the board go along
+    # an edge of the given length: one for every eight cells, spread evenly,
+    # but at least two (a quarter and three quarters of the way along).
+    n = max(length // 8, 2)
+    return [int(round((2*i + 1) * length / (2.0 * n))) for i in range(n)]
+
+
+def edge_walls(size):
+    # Return the walls sticking in from the edges of a board of the given
+    # size, in doubled coordinates.
+    w, h = size
+    ys = edge_positions(h)
+    xs = edge_positions(w)
+    return ([(0, 2*y-1) for y in ys] + [(2*w-2, 2*y-1) for y in ys] +
+            [(2*x-1, 0) for x in xs] + [(2*x-1, 2*h-2) for x in xs])
+
+
+
+class MoveHistory(object):
+
+    # The undo/redo stack. It behaves like a list of (color, start, end)
+    # moves, but each move is packed into one integer, the robot's number
+    # above its start and end cell numbers, and they're kept in an array.
+    # That's 4 bytes a move on most boards, instead of a tuple each.
+
+    __slots__ = ('colors', 'color_bits', 'width', 'bits', 'mask', 'moves')
+
+    def __init__(self, colors, size):
+        w, h = size
+        self.colors = colors
+        self.width = w
+        self.bits = bits = (w * h).bit_length()
+        self.mask = (1 << bits) - 1
+        # The robot number of each color, already shifted into place
+        self.color_bits = dict([(color, i << (2*bits)) for i, color in enumerate(colors)])
+        self.moves = array('i' if 2*bits + len(colors).bit_length() < 32 else 'q')
+
+    def pack(self, move):
+        color, (x1, y1), (x2, y2) = move
+        w = self.width
+        return self.color_bits[color] | ((x1 + y1*w) << self.bits) | (x2 + y2*w)
+
+    def unpack(self, n):
+        w = self.width
+        bits = self.bits
+        end = n & self.mask
+        start = (n >> bits) & self.mask
+        return (self.colors[n >> (2*bits)], (start % w, start // w), (end % w, end // w))
+
+    def append(self, move):
+        self.moves.append(self.pack(move))
+
+    def __len__(self):
+        return len(self.moves)
+
+    def __getitem__(self, i):
+        return self.unpack(self.moves[i])
+
+    def __delitem__(self, i):
+        # Only for cutting off the end of the stack, as in del moves[n:]
+        del self.moves[i]
+
+    def __iter__(self):
+        for n in self.moves:
+            yield self.unpack(n)
+
+
+
+class Board(object):
+
+    # Servers keep thousands of boards alive, so there's no per-board dict
+    __slots__ = ('size', 'colors', 'objects', 'random', 'center_positions', 'robots', 'origpos',
+                 'targets', 'goal', 'walls', 'edges', 'wall_set', 'stops', 'partial_stops',
+                 'lower_bounds', 'cell_bits', 'moves', 'move_index', 'bag')
+
+    # Constructor
+
+    def __init__(self, size=DEFAULT_BOARD_SIZE, colors=COLORS, objects=OBJECTS, seed=None,
+                 randomize=True):
+        self.size = size
+        self.colors = colors
+        self.objects = objects
+        self.random = random.Random(seed)
+        w, h = self.size
+        self.center_positions = [(x, y) for x in (w//2-1, w//2) for y in (h//2-1, h//2)]
+        # Robot positions, keyed by color
+        self.robots = {}
+        self.origpos = {}
+        for color in self.colors:
+            self.robots[color] = self.origpos[color] = None
+        # Target positions, keyed by (color, object)
+        self.targets = {}
+        for color in self.colors:
+            for object in self.objects:
+                self.targets[color, object] = None
+        self.targets['wild', 'wild'] = None
+        self.goal = None
+        # Walls are stored by their position in doubled coordinates: a wall
+        # between the cells (x1, y1) and (x2, y2) lives at (x1+x2, y1+y2).
+        # The first few are the edge walls, which never change, and there
+        # are self.edges of them.
+        self.walls = edge_walls(size)
+        self.edges = len(self.walls)
+        self.wall_set = None
+        self.stops = None
+        self.cell_bits = (w * h).bit_length()
+        self.moves = MoveHistory(colors, size)
+        self.move_index = 0
+        self.bag = []
+        if randomize:
+            self.reset_game()
+        else:
+            self.update_walls()
+
+
+
+    # Rules of the game
+
+
+    def on_board(self, x, y):
+        # True if the cell (x, y) is inside the board
+        return (0 <= x < self.size[0]) and (0 <= y < self.size[1])
+
+
+    def is_at_goal(self):
+        # True if the current goal is met, False if not
+        if not self.goal:
+            return False
+        pos = self.targets[self.goal]
+        if self.goal[0] == 'wild':
+            return any([robot == pos for robot in self.robots.values()])
+        return self.robots[self.goal[0]] == pos
+
+
+    def is_blocked(self, x, y, dx, dy):
+        # True if a robot at (x, y) can't take a single step in the direction
+        # (dx, dy), not counting other robots.
+        x2, y2 = x+dx, y+dy
+        if not self.on_board(x2, y2):
+            return True # We hit the edge of the board
+        if (x+x2, y+y2) in self.wall_set:
+            return True # We hit a wall
+        if (x2, y2) in self.center_positions:
+            return True # We hit the thing in the center of the board
+        return False
+
+
+    def update_walls(self):
+        # Throw away the stop tables and the distance maps if the walls have
+        # changed. The tables get filled in again as robots move. The
+        # distance maps, keyed by target cell, are filled in by
+        # Solver.lower_bound(), and a new dict is made rather than clearing
+        # the old one so that solvers made for the old walls keep theirs.
+        wall_set = set(self.walls)
+        if wall_set != self.wall_set:
+            self.wall_set = wall_set
+            self.lower_bounds = {}
+            self.stops = None
+            self.partial_stops = dict([(direction, {}) for direction in DIRECTIONS])
+
+
+    def get_stops(self):
+        # Return the stop tables, building them if need be. stops[direction]
+        # maps every cell to the cell a robot starting there would stop at
+        # if there were no other robots on the board.
+        if self.stops is not None:
+            return self.stops
+        self.stops = {}
+        w, h = self.size
+        # The same test as is_blocked(), inlined since this is run for
+        # every cell of every new board
+        walls = self.wall_set
+        center = set(self.center_positions)
+        for direction in DIRECTIONS:
+            dx, dy = STEPS[direction]
+            stops = self.stops[direction] = {}
+            # Visit the cells starting from the far side, so that the stop
+            # cell of the next cell over is always known already.
+            xs = range(w-1, -1, -1) if dx > 0 else range(w)
+            ys = range(h-1, -1, -1) if dy > 0 else range(h)
+            for x in xs:
+                x2 = x + dx
+                if not (0 <= x2 < w):
+                    for y in ys:
+                        stops[x, y] = (x, y)
+                    continue
+                for y in ys:
+                    y2 = y + dy
+                    if (0 <= y2 < h) and ((x+x2, y+y2) not in walls) and ((x2, y2) not in center):
+                        stops[x, y] = stops[x2, y2]
+                    else:
+                        stops[x, y] = (x, y)
+        return self.stops
+
+
+    def stop(self, start, direction):
+        # Return the cell a robot at start would stop at if it moved in the
+        # given direction with no other robots on the board. Without the
+        # full stop tables, walk there and remember the answer for every
+        # cell along the way, which is much cheaper than building the
+        # tables when a board only sees a few moves.
+        if self.stops is not None:
+            return self.stops[direction][start]
+        stops = self.partial_stops[direction]
+        end = stops.get(start)
+        if end is None:
+            dx, dy = STEPS[direction]
+            x, y = start
+            path = [start]
+            while not self.is_blocked(x, y, dx, dy):
+                x += dx
+                y += dy
+                end = stops.get((x, y))
+                if end is not None:
+                    break
+                path.append((x, y))
+            else:
+                end = (x, y)
+            for pos in path:
+                stops[pos] = end
+        return end
+
+
+    def packed_robots(self):
+        # Return the robot positions packed into one integer, with each
+        # robot's cell number x + y*w in its own run of bits
+        w = self.size[0]
+        bits = self.cell_bits
+        key = 0
+        for x, y in self.robots.values():
+            key = (key << bits) | (x + y*w)
+        return key
+
+
+    def slide(self, color, direction):
+        # Determine where the robot given by "color" would end up if it moved
+        # in the direction given by "direction". Robots keep moving until they
+        # hit a wall or another robot.
+        x, y = start = self.robots[color]
+        x2, y2 = end = self.stop(start, direction)
+        if end == start:
+            return end
+        dx, dy = STEPS[direction]
+        # Stop short of the nearest robot between here and there
+        for other in self.robots.values():
+            ox, oy = other
+            if dx:
+                if (oy == y) and (0 < (ox-x)*dx <= (x2-x)*dx):
+                    x2, y2 = end = (ox-dx, y)
+            elif (ox == x) and (0 < (oy-y)*dy <= (y2-y)*dy):
+                x2, y2 = end = (x, oy-dy)
+        return end
+
+
+    def move(self, color, direction):
+        # Moves the robot given by "color" in the direction given by "direction".
+        # Return True if the robot actually moved
+        start = self.robots[color]
+        end = self.slide(color, direction)
+        # Update the stack
+        del self.moves[self.move_index:]
+        self.moves.append((color, start, end))
+        self.robots[color] = end
+        self.move_index += 1
+        return end != start
+
+
+    def undo(self):
+        # Undo the most recent action if possible.
+        # Return the (color, start, end) entry that was undone, or None.
+        if self.moves and (self.move_index != 0):
+            self.move_index -= 1
+            color, start, end = move = self.moves[self.move_index]
+            self.robots[color] = start
+            return move
+
+
+    def redo(self):
+        # Redo the most recent action if possible.
+        # Return the (color, start, end) entry that was redone, or None.
+        if self.moves and (self.move_index < len(self.moves)):
+            color, start, end = move = self.moves[self.move_index]
+            self.robots[color] = end
+            self.move_index += 1
+            return move
+
+
+    def reset_moves(self):
+        # Resets the move stack, and makes the current robot positions the
+        # ones that reset_robots() goes back to.
+        del self.moves[:]
+        self.move_index = 0
+        self.origpos.update(self.robots)
+
+
+    def reset_robots(self):
+        # Reset the position of the robots since the last object was drawn.
+        # This doesn't clear the stack, but rather moves back to the beginning of it.
+        # It's functionally equivalent to calling undo() as many times as you can.
+        self.move_index = 0
+        self.robots.update(self.origpos)
+
+
+    def snapshot(self):
+        # Return where the robots are and how far along the stack we are,
+        # as a pair of integers
+        return (self.packed_robots(), self.move_index)
+
+
+    def restore(self, snapshot):
+        # Go back to a snapshot(), as undo() or redo() would if called
+        # enough times. The moves before the snapshot must still be on the
+        # stack, which they are unless some were undone and then replaced.
+        key, self.move_index = snapshot
+        w = self.size[0]
+        mask = (1 << self.cell_bits) - 1
+        for color in reversed(list(self.robots)):
+            cell = key & mask
+            self.robots[color] = (cell % w, cell // w)
+            key >>= self.cell_bits
+
+
+    def reset_game(self):
+        # Start a new game. Randomize the game board,
+        # clear the stack, and fill the bag back up.
+        self.randomize()
+        self.reset_moves()
+        self.bag = list(self.targets)
+        self.goal = None
+
+
+    def draw(self, key=None):
+        # Draw a new object out of the bag and make it the goal. This clears
+        # the stack. Return the key of the new goal, or None if the bag is empty.
+        # A key can be given to draw that object instead of a random one, as
+        # when replaying a game.
+        if self.bag:
+            self.reset_moves()
+            if key is None:
+                key = self.random.choice(self.bag)
+            self.bag.remove(key)
+            self.goal = key
+            return key
+
+
+
+
+
+    # Function to randomly position everything
+
+    def free_points(self):
+        # Return the list of cells things can be placed on, a dict giving
+        # where each one is in the list, and the neighbors of a cell to keep
+        # clear of other things
+        objects = len(self.robots) + len(self.targets)
+        free = FREE_POINTS.get((self.size, objects))
+        if free is None:
+            # Figure out if we can afford to get rid of the edges
+            if (self.size[0] - 1) * (self.size[1] - 1) - 4 >= 5 * objects:
+                points = [(x, y) for x in range(1, self.size[0]-1) for y in range(1, self.size[1]-1)]
+            else:
+                points = [(x, y) for x in range(self.size[0]) for y in range(self.size[1])]
+            for point in self.center_positions:
+                points.remove(point)
+            # Figure out if we can afford to avoid placing targets diagonally
+            # next to one another, or next to one another at all. Each thing
+            # placed takes at most that many points out, so there's always
+            # one left for the last of them.
+            if len(points) >= 9 * objects:
+                neighbors = [(dx, dy) for dx in (-1, 0, 1) for dy in (-1, 0, 1)]
+            elif len(points) > 5 * (objects - 1):
+                neighbors = [(0, 0), (-1, 0), (1, 0), (0, -1), (0, 1)]
+            elif len(points) >= objects:
+                neighbors = [(0, 0)]
+            else:
+                raise ValueError('a %dx%d board only has room for %d robots and targets, not %d'
+                                 % (self.size[0], self.size[1], len(points), objects))
+            free = FREE_POINTS[self.size, objects] = (
+                points, dict([(point, i) for i, point in enumerate(points)]), neighbors)
+        return free
+
+
+    def randomize_robots(self, choices=None):
+        # Move the robots to new random cells, leaving the walls and targets
+        # where they are, and start the stack again from there. The robots
+        # keep the same distance from the targets and from each other as
+        # randomize() gives them, wherever there's room for it. choices, if
+        # given, is a list of the points each robot may go on, in the same
+        # order as the robots. Raises ValueError if a robot has nowhere to go.
+        points, index, neighbors = self.free_points()
+        taken = set(self.targets.values())
+        crowded = set([(x+dx, y+dy) for x, y in taken for dx, dy in neighbors])
+        for i, color in enumerate(self.robots):
+            allowed = points if choices is None else choices[i]
+            options = [point for point in allowed if point not in crowded]
+            if not options:
+                options = [point for point in allowed if point not in taken]
+                if not options:
+                    raise ValueError('nowhere to put the %s robot' % color)
+            x, y = point = options[self.random.randrange(len(options))]
+            taken.add(point)
+            crowded.update([(x+dx, y+dy) for dx, dy in neighbors])
+            self.robots[color] = point
+        self.reset_moves()
+
+
+    def randomize(self):
+        # Delete any preexisting walls
+        del self.walls[self.edges:]
+        # Get the list of objects we need to randomly place
+        objects = list(self.robots) + list(self.targets)
+        free_points, free_index, neighbors = self.free_points()
+        # The points that are still free, and where each one is in the list.
+        # Taking a point out swaps the last point into its place, so nothing
+        # has to be refiltered after each placement.
+        points = free_points[:]
+        index = free_index.copy()
+        for object in objects:
+            # Randomly choose as many points as we need
+            x, y = point = points[self.random.randrange(len(points))]
+            # Avoid having a point next to another point if possible
+            for dx, dy in neighbors:
+                i = index.pop((x+dx, y+dy), None)
+                if i is not None:
+                    last = points.pop()
+                    if i < len(points):
+                        points[i] = last
+                        index[last] = i
+            if object in self.robots:
+                self.robots[object] = point
+            else:
+                # It's a target, create the walls to go with the target
+                # and put them on random sides
+                self.targets[object] = point
+                self.walls.append((2*x + self.random.choice((-1, 1)), 2*y))
+                self.walls.append((2*x, 2*y + self.random.choice((-1, 1))))
+        self.update_walls()
+
+
+
+    # Compact form of a randomized board
+
+    def get_layout(self):
+        # Return the robot cells, the target cells and the sides of the
+        # target walls as a tuple of three tuples of small integers. Cell
+        # (x, y) is x + y*w, and bit 0 or 1 of a side is set if the target's
+        # left/right or top/bottom wall is on its right or bottom side.
+        w = self.size[0]
+        robots = tuple([x + y*w for x, y in self.robots.values()])
+        targets = tuple([x + y*w for x, y in self.targets.values()])
+        sides = []
+        for x, y in self.targets.values():
+            sides.append(int((2*x+1, 2*y) in self.wall_set) + 2*int((2*x, 2*y+1) in self.wall_set))
+        return (robots, targets, tuple(sides))
+
+
+    def set_layout(self, layout):
+        # Put everything back where get_layout() said it was, and start a
+        # new game on that board.
+        w = self.size[0]
+        robots, targets, sides = layout
+        del self.walls[self.edges:]
+        for color, cell in zip(list(self.robots), robots):
+            self.robots[color] = (cell % w, cell // w)
+        for key, cell, side in zip(list(self.targets), targets, sides):
+            x, y = self.targets[key] = (cell % w, cell // w)
+            self.walls.append((2*x + (1 if side & 1 else -1), 2*y))
+            self.walls.append((2*x, 2*y + (1 if side & 2 else -1)))
+        self.update_walls()
+        self.reset_moves()
+        self.bag = list(self.targets)
+        self.goal = None
+
+
+    def set_positions(self, walls, robots, targets):
+        # Put the walls, robots and targets where given, in the same form as
+        # the attributes of the same names, and start a new game on that
+        # board. The edge walls are always kept.
+        edges = self.walls[:self.edges]
+        self.walls[self.edges:] = [pos for pos in walls if pos not in edges]
+        self.robots.update(robots)
+        self.targets.update(targets)
+        self.update_walls()
+        self.reset_moves()
+        self.bag = list(self.targets)
+        self.goal = None
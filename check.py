@@ -0,0 +1,169 @@
+# Ricochet Robots consistency checks
+
+# Runs the fast versions of the game's hot paths side by side with the
+# plain ones they stand in for, on seeded random boards, and reports every
+# place they disagree. Each check returns a list of mismatches, described
+# as text, so an empty list is a pass. Exits with status 1 if anything
+# failed, so it can be run after changing any of them.
+#
+#   python check.py [--seed 1] [--quick]
+
+import sys
+import random
+
+from board import Board, DIRECTIONS
+
+
+DEFAULT_SEED = 1
+
+BATCH_BOARDS = 300
+BATCH_STEPS = 200
+BATCH_SIZES = ((16, 16), (10, 7))
+
+PUZZLE_BOARDS = 20
+PUZZLE_FOUND = 10
+PUZZLE_MOVES = (5, 8)
+PUZZLE_SECONDS = 60.0
+
+PARALLEL_BOARDS = 12
+PARALLEL_PROCESSES = 2
+PARALLEL_MAX_DEPTH = 9
+
+
+
+def check_batch(seed, scale):
+    # The same random moves on a BatchBoard and on each of its Boards. The
+    # robots have to end up in the same place, and the same boards have to
+    # say that a robot moved. This needs NumPy.
+    try:
+        from batch import BatchBoard
+    except ImportError:
+        return None
+    rng = random.Random(seed)
+    mismatches = []
+    for size in BATCH_SIZES:
+        boards = [Board(size, seed=rng.getrandbits(32)) for i in range(max(int(BATCH_BOARDS * scale), 1))]
+        try:
+            batch = BatchBoard(boards)
+        except ImportError:
+            return None
+        colors = boards[0].colors
+        w = size[0]
+        for step in range(BATCH_STEPS):
+            # A robot and direction per board, so that boards differ in what
+            # they do as well as in where things are
+            robots = [rng.randrange(len(colors)) for board in boards]
+            directions = [rng.randrange(len(DIRECTIONS)) for board in boards]
+            moved = batch.move(robots, directions)
+            for b, board in enumerate(boards):
+                color, direction = colors[robots[b]], DIRECTIONS[directions[b]]
+                before = dict(board.robots)
+                board.move(color, direction)
+                if batch.positions(b) != board.robots:
+                    mismatches.append('%dx%d board %d, step %d: %s %s gave %s, not %s'
+                                      % (w, size[1], b, step, color, direction, batch.positions(b), board.robots))
+                    # Carry on from where the board says, so one mistake
+                    # isn't counted again at every step after it
+                    batch.robots[b] = [x + y*w for x, y in [board.robots[c] for c in colors]]
+                elif bool(moved[b]) != (before != board.robots):
+                    mismatches.append('%dx%d board %d, step %d: %s %s said moved was %s'
+                                      % (w, size[1], b, step, color, direction, bool(moved[b])))
+    return mismatches
+
+
+def check_puzzle(seed, scale):
+    # The moves rate_board() gives each target, on ordinary random boards
+    # and on ones from generate_puzzle(), against solving every target on
+    # its own from scratch. A board has to be turned down exactly when a
+    # target is out of the range, and the moves have to be the same.
+    from solver import Solver
+    from generator import rate_board, generate_puzzle
+    rng = random.Random(seed)
+    low, high = PUZZLE_MOVES
+    mismatches = []
+    def compare(board, what, moves):
+        solver = Solver(board)
+        solved = {}
+        for key in board.targets:
+            solution = solver.solve(key, max_depth=high + 1)
+            solved[key] = high + 1 if solution is None else len(solution)
+        if any([n < low or n > high for n in solved.values()]):
+            solved = None
+        if moves != solved:
+            mismatches.append('%s %s: rated %s, not %s' % (what, board.get_layout(), moves, solved))
+    board = Board(seed=rng.getrandbits(32), randomize=False)
+    for i in range(max(int(PUZZLE_BOARDS * scale), 1)):
+        board.reset_game()
+        compare(board, 'board %d' % i, rate_board(board, low, high))
+    for i in range(max(int(PUZZLE_FOUND * scale), 1)):
+        try:
+            moves = generate_puzzle(board, low, high, PUZZLE_SECONDS)
+        except ValueError:
+            mismatches.append('puzzle %d: none found' % i)
+            continue
+        compare(board, 'puzzle %d' % i, moves)
+    return mismatches
+
+
+def check_parallel(seed, scale):
+    # ParallelSolver against Solver on every target of random boards, with
+    # the workers doing all of the searching. The solutions have to be
+    # the same length, and have to reach the target when played on the
+    # board.
+    from solver import Solver
+    from parallel import ParallelSolver
+    rng = random.Random(seed)
+    mismatches = []
+    for b in range(max(int(PARALLEL_BOARDS * scale), 1)):
+        board = Board(seed=rng.getrandbits(32))
+        solver = Solver(board)
+        with ParallelSolver(board, PARALLEL_PROCESSES, serial_seconds=0) as parallel:
+            for goal in board.targets:
+                solution = solver.solve(goal, max_depth=PARALLEL_MAX_DEPTH)
+                found = parallel.solve(goal, max_depth=PARALLEL_MAX_DEPTH)
+                if (solution is None) != (found is None) or (found is not None and len(found) != len(solution)):
+                    mismatches.append('board %d, %s: %s moves, not %s' % (
+                        b, goal, None if found is None else len(found),
+                        None if solution is None else len(solution)))
+                elif found is not None:
+                    board.goal = goal
+                    for color, direction in found:
+                        board.move(color, direction)
+                    if not board.is_at_goal():
+                        mismatches.append('board %d, %s: %s misses the target' % (b, goal, found))
+                    board.goal = None
+                    board.reset_robots()
+                    board.reset_moves()
+    return mismatches
+
+
+CHECKS = [check_batch, check_puzzle, check_parallel]
+
+
+
+def main(seed=DEFAULT_SEED, scale=1.0, out=sys.stdout):
+    # Run every check and return True if they all passed
+    passed = True
+    for check in CHECKS:
+        name = check.__name__[len('check_'):]
+        mismatches = check(seed, scale)
+        if mismatches is None:
+            out.write('%-12s skipped\n' % name)
+            continue
+        for mismatch in mismatches[:10]:
+            out.write('  %s\n' % mismatch)
+        if len(mismatches) > 10:
+            out.write('  ... and %d more\n' % (len(mismatches) - 10))
+        out.write('%-12s %s\n' % (name, 'ok' if not mismatches else '%d mismatches' % len(mismatches)))
+        out.flush()
+        passed = passed and not mismatches
+    return passed
+
+
+if __name__ == '__main__':
+    import argparse
+    parser = argparse.ArgumentParser(description='Check the fast Ricochet Robots code against the plain code.')
+    parser.add_argument('--seed', type=int, default=DEFAULT_SEED)
+    parser.add_argument('--quick', action='store_true', help='do a tenth of the work')
+    args = parser.parse_args()
+    sys.exit(0 if main(args.seed, 0.1 if args.quick else 1.0) else 1)
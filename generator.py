@@ -0,0 +1,292 @@
+# Ricochet Robots board generator
+
+# Makes batches of random boards without a display, using the same placement
+# rules as Game. Each board comes out in the compact form returned by
+# Board.get_layout(), and can be put back with Board.set_layout().
+
+import sys
+import time
+import random
+
+from board import Board, DEFAULT_BOARD_SIZE, COLORS, ALL_COLORS, OBJECTS
+from solver import Solver, DEFAULT_REACH_DEPTH
+
+
+DEFAULT_PUZZLE_SECONDS = 10.0 # Longest to look for a board in a range of difficulty
+DEFAULT_ROBOT_TRIES = 50 # Robot placements to try on each set of walls
+DEFAULT_WALL_FAILURES = 2 # Placements with a target that's too hard before trying new walls
+DEFAULT_SOLVE_SECONDS = 0.2 # Longest to spend on one target before trying another board
+
+
+
+def generate_boards(seeds, size=DEFAULT_BOARD_SIZE, colors=COLORS, objects=OBJECTS):
+    # Return the layout of the board randomized from each of the given seeds
+    board = Board(size, colors, objects, randomize=False)
+    layouts = []
+    for seed in seeds:
+        board.random.seed(seed)
+        board.randomize()
+        layouts.append(board.get_layout())
+    return layouts
+
+
+def _generate_boards(args):
+    # Unpack the arguments for generate_boards() in a worker process
+    return generate_boards(*args)
+
+
+def generate(n, seed=None, size=DEFAULT_BOARD_SIZE, colors=COLORS, objects=OBJECTS,
+             processes=1, chunksize=1000):
+    # Return the layouts of n random boards. Every board gets its own seed
+    # drawn from the given one, so the result is the same no matter how many
+    # processes the work is split across.
+    rng = random.Random(seed)
+    seeds = [rng.getrandbits(64) for i in range(n)]
+    chunks = [(seeds[i:i+chunksize], size, colors, objects) for i in range(0, n, chunksize)]
+    if processes == 1:
+        results = map(_generate_boards, chunks)
+    else:
+        # Only imported when needed, since it's slow to import
+        import multiprocessing
+        pool = multiprocessing.Pool(processes)
+        try:
+            results = pool.map(_generate_boards, chunks)
+        finally:
+            pool.close()
+            pool.join()
+    layouts = []
+    for result in results:
+        layouts.extend(result)
+    return layouts
+
+
+
+# Boards with every target inside a range of difficulty
+
+def solo_reached(solver, robots, max_depth):
+    # Return a list with a dict for each robot, in the same form as from
+    # Solver.levels(), of the fewest moves it takes that robot to stop at
+    # each cell up to max_depth moves away if none of the others move.
+    # Those are never fewer than the real numbers, so a target that's too
+    # easy here is too easy.
+    occupied = 0
+    for cell in robots:
+        occupied |= 1 << cell
+    cell_moves = solver.cell_moves
+    reached = []
+    for start in robots:
+        others = occupied ^ (1 << start)
+        r = {start: 0}
+        frontier = [start]
+        depth = 0
+        while frontier and depth < max_depth:
+            depth += 1
+            next_frontier = []
+            for cell in frontier:
+                for d, stop, ray, delta in cell_moves[cell]:
+                    blockers = ray & others
+                    if not blockers:
+                        end = stop
+                    elif delta > 0:
+                        end = (blockers & -blockers).bit_length() - 1 - delta
+                    else:
+                        end = blockers.bit_length() - 1 - delta
+                    if end not in r:
+                        r[end] = depth
+                        next_frontier.append(end)
+            frontier = next_frontier
+        reached.append(r)
+    return reached
+
+
+def robot_choices(board, solver, min_moves):
+    # Return a list for each robot of the points it can start on without
+    # being able to reach one of its own targets, or the wild target, in
+    # fewer than min_moves moves on its own. A robot anywhere else only
+    # makes a board that isn't too easy if another robot happens to be in
+    # its way, so leaving those points out hardly changes which boards
+    # come out, and saves trying most of the boards that are too easy.
+    distances = dict([(key, solver.solo_distance(solver.cell(pos))) for key, pos in board.targets.items()])
+    cells = [(point, solver.cell(point)) for point in board.free_points()[0]]
+    choices = []
+    for color in board.colors:
+        maps = [distance for key, distance in distances.items() if key[0] in (color, 'wild')]
+        choices.append([point for point, cell in cells
+                        if min([distance[cell] for distance in maps]) >= min_moves])
+    return choices
+
+
+def rate_board(board, min_moves, max_moves, reach_depth=DEFAULT_REACH_DEPTH, solver=None,
+               time_limit=None, failures=None):
+    # Return a dict giving the optimal number of moves to each target on the
+    # board, or None as soon as any target turns out to need fewer than
+    # min_moves or more than max_moves. One solver is shared by all the
+    # targets, so the tables for the walls are only worked out once. A
+    # solver can be passed in to share it with other boards with the same
+    # walls. If a time limit is given, a target that takes longer than that
+    # many seconds to solve also gives None. failures, if given, is a dict
+    # counting how many times each target has been too hard on boards with
+    # the same walls; those are solved first, since they're the likeliest
+    # to be too hard again, and the counts are kept up to date.
+    if solver is None:
+        solver = Solver(board)
+    if failures is None:
+        failures = {}
+    robots = [solver.cell(board.robots[color]) for color in board.colors]
+    # Moving one robot at a time quickly finds most of the boards with a
+    # target that's too easy
+    if solver.target_moves(solo_reached(solver, robots, min_moves - 1)):
+        return None
+    bounds = {}
+    for key, pos in board.targets.items():
+        bound = solver.lower_bound(solver.cell(pos))
+        if key[0] == 'wild':
+            bounds[key] = min([bound[cell] for cell in robots])
+        else:
+            bounds[key] = bound[robots[board.colors.index(key[0])]]
+        if bounds[key] > max_moves:
+            return None # Hopeless, no need to search
+    # One breadth-first search finds every target that can be reached in
+    # up to reach_depth moves, which is where the targets that are too
+    # easy turn up, usually in the first level or two.
+    for depth, reached in solver.levels():
+        moves = solver.target_moves(reached)
+        if any([n < min_moves for n in moves.values()]):
+            return None
+        if (depth >= min(reach_depth, max_moves)) or (len(moves) == len(board.targets)):
+            break
+    # Moving one robot at a time also reaches most of the rest within
+    # max_moves moves, which is never fewer than they need, so the solver
+    # only has to look for something shorter than that. Anything left
+    # after the search that needs exactly one more than it went to is
+    # already known.
+    upper = solver.target_moves(solo_reached(solver, robots, max_moves))
+    # Solve whatever is left one at a time. The ones with no way known to
+    # reach them in max_moves moves are the only ones that can turn out to
+    # need too many, so they go first, and the hardest-looking of those
+    # before the rest.
+    left = [key for key in bounds if key not in moves]
+    left.sort(key=lambda key: (key not in upper, failures.get(key, 0), bounds[key]), reverse=True)
+    for key in left:
+        most = upper.get(key, max_moves + 1) - 1
+        solution = None
+        if most > depth:
+            solution = solver.solve(key, max_depth=most, time_limit=time_limit, min_depth=depth + 1)
+            if solver.timed_out or (solution is None and key not in upper):
+                failures[key] = failures.get(key, 0) + 1
+                return None
+        moves[key] = upper[key] if solution is None else len(solution)
+        if moves[key] < min_moves:
+            return None
+    return moves
+
+
+def generate_puzzle(board, min_moves, max_moves, seconds=DEFAULT_PUZZLE_SECONDS,
+                    robot_tries=DEFAULT_ROBOT_TRIES, wall_failures=DEFAULT_WALL_FAILURES):
+    # Start new games on the board until every target needs between min_moves
+    # and max_moves moves. Return a dict giving the optimal number of moves
+    # to each target, or raise ValueError if no board was good enough within
+    # the given number of seconds. Only the robots are moved between most
+    # tries, so that the solver, its stop tables and its distance maps can
+    # be kept. The walls are changed every robot_tries tries, or as soon as
+    # wall_failures placements of the robots have left a target that needs
+    # too many moves, since that usually comes down to the walls.
+    deadline = time.time() + seconds
+    while time.time() < deadline:
+        board.reset_game()
+        solver = Solver(board)
+        choices = robot_choices(board, solver, min_moves)
+        failures = {}
+        for i in range(robot_tries):
+            left = deadline - time.time()
+            if left <= 0 or sum(failures.values()) >= wall_failures:
+                break
+            try:
+                board.randomize_robots(choices)
+            except ValueError:
+                break # Some robot can't go anywhere on these walls
+            # Searching all the robots together only needs to go far enough to
+            # catch the targets that are too easy; the solver does the rest
+            moves = rate_board(board, min_moves, max_moves, max(min_moves - 1, 1), solver,
+                               min(DEFAULT_SOLVE_SECONDS, left), failures)
+            if moves is not None:
+                return moves
+    raise ValueError('no board with every target between %d and %d moves in %g seconds'
+                     % (min_moves, max_moves, seconds))
+
+
+def _generate_puzzle(args):
+    # Unpack the arguments for generate_puzzle() in a worker process, and
+    # send back the layout of the board along with the moves, since the
+    # board itself stays in the worker
+    size, colors, objects, seed, min_moves, max_moves, seconds = args
+    board = Board(size, colors, objects, seed, randomize=False)
+    moves = generate_puzzle(board, min_moves, max_moves, seconds)
+    return board.get_layout(), moves
+
+
+def generate_puzzles(n, min_moves, max_moves, seed=None, size=DEFAULT_BOARD_SIZE, colors=COLORS,
+                     objects=OBJECTS, seconds=DEFAULT_PUZZLE_SECONDS, processes=1):
+    # Return a list of n pairs of the layout of a board from generate_puzzle()
+    # and the moves to each of its targets. As with generate(), every board
+    # gets its own seed drawn from the given one, and with more than one
+    # process that many boards are looked for at once.
+    rng = random.Random(seed)
+    tasks = [(size, colors, objects, rng.getrandbits(64), min_moves, max_moves, seconds)
+             for i in range(n)]
+    if processes == 1:
+        return list(map(_generate_puzzle, tasks))
+    # Only imported when needed, since it's slow to import
+    import multiprocessing
+    pool = multiprocessing.Pool(processes)
+    try:
+        return pool.map(_generate_puzzle, tasks, chunksize=1)
+    finally:
+        pool.close()
+        pool.join()
+
+
+def distribution(moves):
+    # Return a dict giving how many targets need each number of moves
+    counts = {}
+    for n in moves.values():
+        counts[n] = counts.get(n, 0) + 1
+    return counts
+
+
+
+# Write boards out as JSON, one per line
+
+if __name__ == '__main__':
+    import json
+    import argparse
+    parser = argparse.ArgumentParser(description='Generate random Ricochet Robots boards.')
+    parser.add_argument('n', type=int, help='number of boards')
+    parser.add_argument('--seed', type=int, default=None)
+    parser.add_argument('--size', type=int, nargs=2, default=DEFAULT_BOARD_SIZE)
+    parser.add_argument('--robots', type=int, default=len(COLORS), choices=range(1, len(ALL_COLORS) + 1),
+                        help='number of robots')
+    parser.add_argument('--processes', type=int, default=1,
+                        help='number of worker processes (0 for one per CPU)')
+    parser.add_argument('--moves', type=int, nargs=2, metavar=('MIN', 'MAX'),
+                        help='only keep boards where every target needs MIN to MAX moves')
+    parser.add_argument('--seconds', type=float, default=DEFAULT_PUZZLE_SECONDS,
+                        help='longest to look for each board with --moves')
+    args = parser.parse_args()
+    colors = ALL_COLORS[:args.robots]
+    if args.moves:
+        # Every board has its targets in the same order as this one
+        board = Board(tuple(args.size), colors, randomize=False)
+        counts = {}
+        for layout, moves in generate_puzzles(args.n, args.moves[0], args.moves[1], args.seed,
+                                              tuple(args.size), colors, seconds=args.seconds,
+                                              processes=(args.processes or None)):
+            for n, count in distribution(moves).items():
+                counts[n] = counts.get(n, 0) + count
+            sys.stdout.write(json.dumps([layout, [moves[key] for key in board.targets]]) + '\n')
+        for n in sorted(counts):
+            sys.stderr.write('%2d moves: %d targets\n' % (n, counts[n]))
+    else:
+        for layout in generate(args.n, args.seed, tuple(args.size), colors,
+                               processes=(args.processes or None)):
+            sys.stdout.write(json.dumps(layout) + '\n')
@@ -0,0 +1,1107 @@
+# Ricochet Robots game window
+# Matthew Kroesche
+
+# Everything that needs Tk. Importing ricochet doesn't import this module
+# until something in it is used, so code that only wants the rules of the
+# game never loads Tk.
+
+try:
+    # Python 3
+    from tkinter import *
+    try:
+        from tkinter.ttk import Button as ttkButton
+    except ImportError:
+        pass
+except ImportError:
+    # Python 2
+    from Tkinter import *
+    try:
+        from ttk import Button as ttkButton
+    except ImportError:
+        pass
+
+import sys
+import time
+
+from board import Board, DEFAULT_BOARD_SIZE, DEFAULT_DELAY_SECONDS, COLORS, OBJECTS
+from generator import _generate_puzzle, distribution, DEFAULT_PUZZLE_SECONDS
+from library import Library
+from hint import Hinter
+from stats import Stats
+from replay import GameLog, read_log
+from ricochet import slide_step, CELLS_PER_SECOND, FRAMES_PER_SECOND
+
+
+DEFAULT_CELL_SIZE = 40
+DEFAULT_DPAD_SIZE = 150
+PUZZLE_CHECK_SECONDS = 0.05 # How often to see if a board being looked for has turned up
+PUZZLES_AHEAD = 1 # Boards to look for ahead of the next game, besides one per extra CPU
+
+DRAWFUNCS = {}
+
+
+def drawfunc(f):
+    # Decorator for drawing functions
+    DRAWFUNCS[f.__name__] = f
+    return f
+
+
+
+# Drawing helper functions
+
+tagcount = 0
+
+def getwidth(bbox):
+    return (bbox[2] - bbox[0]) * 0.125
+
+@drawfunc
+def square(canvas, color, bbox):
+    return canvas.create_rectangle(bbox, outline=color, width=getwidth(bbox))
+
+@drawfunc
+def circle(canvas, color, bbox):
+    return canvas.create_oval(bbox, outline=color, width=getwidth(bbox))
+
+@drawfunc
+def triangle(canvas, color, bbox):
+    x1, y1, x2, y2 = bbox
+    return canvas.create_polygon([
+        (x1, y2), (x2, y2),
+        ((x1+x2)*.5, y1*.85+y2*.15)],
+                                 outline=color, width=getwidth(bbox), fill='')
+
+@drawfunc
+def diamond(canvas, color, bbox):
+    x1, y1, x2, y2 = bbox
+    return canvas.create_polygon([
+        (x1, (y1+y2)*.5), ((x1+x2)*.5, y1),
+        (x2, (y1+y2)*.5), ((x1+x2)*.5, y2)],
+                                 outline=color, width=getwidth(bbox), fill='')
+
+@drawfunc
+def wild(canvas, color, bbox):
+    global tagcount
+    tag = 'tag#%d' % tagcount
+    tagcount += 1
+    x1, y1, x2, y2 = bbox
+    ctr = ((x1+x2)*.5, (y1+y2)*.5)
+    canvas.create_polygon([(x1, y1), (x2, y1), ctr], fill='red', width=0, tags=tag)
+    canvas.create_polygon([(x1, y2), (x2, y2), ctr], fill='yellow', width=0, tags=tag)
+    canvas.create_polygon([(x1, y1), (x1, y2), ctr], fill='green', width=0, tags=tag)
+    canvas.create_polygon([(x2, y1), (x2, y2), ctr], fill='blue', width=0, tags=tag)
+    return tag
+
+
+
+
+
+
+
+
+
+
+
+
+# Tk helper functions
+
+def test_ttkbutton():
+    # Make sure creating fancy ttk Buttons is supported.
+    global ttkButton
+    try:
+        btn = ttkButton()
+    except (NameError, TclError):
+        # If not, fall back on the regular Tk implementation
+        ttkButton = Button
+    else:
+        btn.destroy()
+        
+
+def enable_button(b, enable):
+    # Enabling/disabling works differently depending on if we're using ttk
+    if ttkButton == Button:
+        b['state'] = (NORMAL if enable else DISABLED)
+    else:
+        b.state(['!disabled' if enable else 'disabled'])
+
+
+GRID_IMAGES = {}
+
+def grid_image(master, size, cellsize):
+    # Return an image of the empty grid of cells, the same as the one
+    # create_canvas draws out of separate canvas items. Images are cached by
+    # size and cell size, and only built once per Tk interpreter.
+    image = GRID_IMAGES.get((size, cellsize))
+    if (image is not None) and (image.tk is master.tk):
+        return image
+    # Draw a single cell one pixel at a time: a black outline along the top
+    # and left, and a light circle in the middle.
+    c = cellsize * .5
+    r = cellsize * .4
+    rows = []
+    for y in range(cellsize):
+        row = []
+        for x in range(cellsize):
+            if x == 0 or y == 0:
+                row.append('#000000')
+            elif (x+.5-c)**2 + (y+.5-c)**2 <= r*r:
+                row.append('#cccccc') # gray80
+            else:
+                row.append('#7f7f7f') # gray50
+        rows.append('{%s}' % ' '.join(row))
+    cell = PhotoImage(master=master, width=cellsize, height=cellsize)
+    cell.put(' '.join(rows))
+    # Then let Tk tile it across the whole board
+    w, h = size
+    image = PhotoImage(master=master, width=w*cellsize, height=h*cellsize)
+    master.tk.call(str(image), 'copy', str(cell), '-to', 0, 0, w*cellsize, h*cellsize)
+    GRID_IMAGES[size, cellsize] = image
+    return image
+
+
+
+
+
+
+
+class Robot(object):
+
+    # Helper class to draw an individual robot. Its position lives on the board.
+
+    __slots__ = ('game', 'color', 'curpos', 'robot_id', 'marker_id')
+
+    def __init__(self, game, color):
+        self.game = game
+        self.color = color
+        self.curpos = None
+        self.robot_id = self.marker_id = None
+
+    @property
+    def pos(self):
+        return self.game.board.robots[self.color]
+
+    @property
+    def origpos(self):
+        return self.game.board.origpos[self.color]
+
+    def delete_robot(self):
+        # Delete the robot itself from the canvas
+        if (self.robot_id is not None) and self.game.updates_enabled:
+            self.game.canvas.delete(self.robot_id)
+            self.robot_id = None
+
+    def delete_marker(self):
+        # Delete the robot's original position marker from the canvas
+        if (self.marker_id is not None) and self.game.updates_enabled:
+            self.game.canvas.delete(self.marker_id)
+            self.marker_id = None
+
+    def draw(self, pos=None):
+        # Redraw the robot
+        if self.game.updates_enabled:
+            if pos is None:
+                pos = self.pos
+            if pos is not None:
+                self.delete_robot()
+                x, y = [(i+.5)*self.game.cellsize for i in pos]
+                r = .4 * self.game.cellsize
+                self.robot_id = self.game.canvas.create_oval((x-r, y-r, x+r, y+r), fill=self.color)
+
+    def setpos(self):
+        # Draw the robot where it currently is on the board, without animating it.
+        # The animation moves curpos in place, so it's only made once.
+        x, y = self.pos
+        if self.curpos is None:
+            self.curpos = [float(x), float(y)]
+        else:
+            self.curpos[:] = float(x), float(y)
+        self.delete_marker()
+        self.draw()
+
+    def move(self):
+        # Animate the robot to where it has moved on the board
+        if self.curpos is None:
+            self.setpos()
+        elif self.game.updates_enabled:
+            self.game.begin_moving(self)
+            if self.marker_id is None:
+                x, y = [(i+.5)*self.game.cellsize for i in self.origpos]
+                r = .4 * self.game.cellsize
+                self.marker_id = self.game.canvas.create_oval((x-r, y-r, x+r, y+r), outline=self.color)
+
+
+
+
+
+class Target(object):
+
+    __slots__ = ('game', 'key', 'color', 'draw', 'id', 'drawn_pos')
+
+    def __init__(self, game, key, draw):
+        self.game = game
+        self.key = key
+        self.color = key[0]
+        self.draw = draw # draw() should take a canvas, color, and bbox argument
+        # and return a tag or id
+        self.id = None
+        self.drawn_pos = None
+
+    @property
+    def pos(self):
+        return self.game.board.targets[self.key]
+
+    def delete(self):
+        # Delete the target from the canvas
+        if self.id is not None:
+            self.game.canvas.delete(self.id)
+            self.id = None
+            self.drawn_pos = None
+
+    def setpos(self):
+        # Draw the target where it currently is on the board. If it's
+        # already been drawn, just move it there instead.
+        x, y = self.pos
+        cs = self.game.cellsize
+        if self.id is None:
+            self.id = self.draw(self.game.canvas, self.color,
+                                ((x+.3)*cs, (y+.3)*cs,
+                                 (x+.7)*cs, (y+.7)*cs))
+        elif self.drawn_pos != self.pos:
+            x0, y0 = self.drawn_pos
+            self.game.canvas.move(self.id, (x-x0)*cs, (y-y0)*cs)
+        self.drawn_pos = self.pos
+
+    def make_goal(self):
+        # Set this target to the goal
+        self.game.delete_goal()
+        cs = self.game.cellsize
+        cx = self.game.size[0] * cs // 2
+        cy = self.game.size[1] * cs // 2
+        id = self.draw(self.game.canvas, self.color, (cx-.7*cs, cy-.7*cs, cx+.7*cs, cy+.7*cs))
+        self.game.canvas.tag_raise(id)
+        self.game.goal_id = id
+
+
+
+
+
+class Wall(object):
+
+    __slots__ = ('game', 'pos', 'id')
+
+    def __init__(self, game, pos):
+        self.game = game
+        self.pos = pos
+        self.id = None
+        self.create()
+
+    def delete(self):
+        # Delete the wall object
+        if self.id is not None:
+            self.game.canvas.delete(self.id)
+            self.id = None
+
+    def bbox(self):
+        # Get the bounding box of the wall on the canvas
+        s = self.game.cellsize // 2
+        x, y = self.pos
+        if x % 2:
+            return ((x+.9)*s, (y-.1)*s, (x+1.1)*s, (y+2.1)*s)
+        return ((x-.1)*s, (y+.9)*s, (x+2.1)*s, (y+1.1)*s)
+
+    def create(self):
+        # Draw the wall object. Called automatically at initialization.
+        # Walls are all tagged 'wall', so that they can be raised above
+        # everything else in one go.
+        self.delete()
+        self.id = self.game.canvas.create_rectangle(self.bbox(), fill='gray20', width=0, tags='wall')
+
+    def setpos(self, pos):
+        # Move the wall object somewhere else, reusing its canvas item
+        self.pos = pos
+        if self.id is None:
+            self.create()
+        else:
+            self.game.canvas.coords(self.id, *self.bbox())
+        
+
+
+
+
+
+
+
+
+
+
+
+class Game(Tk):
+
+    # Constructor
+
+    def __init__(self, size=DEFAULT_BOARD_SIZE, cellsize=DEFAULT_CELL_SIZE,
+                 delay=DEFAULT_DELAY_SECONDS, dpadsize=DEFAULT_DPAD_SIZE,
+                 colors=COLORS, objects=OBJECTS, seed=None, difficulty=None,
+                 cache_grid=False, library=None, stats=None, log=None, **drawfuncs):
+        # difficulty, if given, is a (min_moves, max_moves) pair that the
+        # optimal solution to every target on a new board has to fall within.
+        # cache_grid draws the empty grid as one cached image instead of two
+        # canvas items per cell, which is much faster on big boards.
+        # library, if given, is the path of a board library to pick new
+        # boards out of instead of randomizing them.
+        # stats turns on the timing counters and histograms: True, or the
+        # number of seconds between dumps, which has to be more than 0. By
+        # default it's up to the RICOCHET_STATS environment variable.
+        # log, if given, is the path of a game log to append everything
+        # that happens to.
+        Tk.__init__(self)
+        if stats is None:
+            self.stats = Stats.from_environment()
+        elif stats is True:
+            self.stats = Stats()
+        elif stats and stats > 0:
+            self.stats = Stats(stats)
+        else:
+            self.stats = None
+        self.difficulty = difficulty
+        self.cache_grid = cache_grid
+        self.library = None
+        if library is not None:
+            self.library = Library(library)
+            size, colors, objects = self.library.size, self.library.colors, self.library.objects
+        self.board = Board(size, colors, objects, seed, randomize=False)
+        self.hinter = Hinter(self.board)
+        # Whether to show, in every cell, the fewest moves a robot there
+        # could need to reach the current target
+        self.show_bounds = False
+        self.log = None
+        if log is not None:
+            self.log = GameLog(log)
+            self.log.game(self.board)
+        # The worker processes that look for boards in the range of
+        # difficulty, the board the next game is waiting for, if any, and
+        # the ones being looked for ahead of the games after that
+        self.pool = None
+        self.finding = None
+        self.puzzles = []
+        self.new_board()
+        if self.difficulty and self.library is None:
+            self.find_puzzle()
+        self.cellsize = cellsize
+        self.delay = delay
+        self.dpadsize = dpadsize
+        self.drawfuncs = DRAWFUNCS.copy()
+        self.drawfuncs.update(drawfuncs)
+        self.title('Ricochet Robots')
+        self.moving = []
+        self.slide_frames = 0
+        self.tick_id = None
+        self.updates_enabled = True
+        self.buttons_enabled = True
+        self.create_canvas()
+        self.create_controls()
+        self.reset_view()
+        if self.stats is not None:
+            self.after(int(1000 * self.stats.interval), self.dump_stats)
+
+
+
+
+    # The rules of the game live on the board; these are views onto it
+
+    @property
+    def size(self):
+        return self.board.size
+
+    @property
+    def colors(self):
+        return self.board.colors
+
+    @property
+    def objects(self):
+        return self.board.objects
+
+    @property
+    def center_positions(self):
+        return self.board.center_positions
+
+    @property
+    def moves(self):
+        return self.board.moves
+
+    @property
+    def move_index(self):
+        return self.board.move_index
+
+    @property
+    def bag(self):
+        return self.board.bag
+
+
+
+
+    # Methods to initialize various parts of the game
+
+
+    def create_canvas(self):
+        if hasattr(self, 'canvas'):
+            self.canvas.destroy()
+        # Initialize canvas
+        w, h = self.size
+        self.canvas = Canvas(self, width = w * self.cellsize, height = h * self.cellsize)
+        self.canvas.pack(side=LEFT)
+        # Place cells in grid frame
+        if self.cache_grid:
+            # All in one image, so that the canvas doesn't have an item for every cell
+            self.canvas.create_image((0, 0), image=grid_image(self, self.size, self.cellsize), anchor=NW)
+        else:
+            for i in range(w):
+                for j in range(h):
+                    if (i, j) in self.center_positions:
+                        continue # Leave cell as None since the middle block is going to go there
+                    self.canvas.create_rectangle(
+                        (i*self.cellsize, j*self.cellsize, (i+1)*self.cellsize, (j+1)*self.cellsize),
+                        fill='gray50')
+                    self.canvas.create_oval(
+                        ((i+.1)*self.cellsize, (j+.1)*self.cellsize, (i+.9)*self.cellsize, (j+.9)*self.cellsize),
+                        fill='gray80', width=0)
+        # Create center block
+        self.canvas.create_rectangle(
+            ((w//2-1)*self.cellsize, (h//2-1)*self.cellsize, (w//2+1)*self.cellsize, (h//2+1)*self.cellsize),
+            fill='gray20')
+        # Create robots
+        self.robots = {}
+        for color in self.colors:
+            self.robots[color] = Robot(self, color)
+        # Create targets
+        self.targets = {}
+        self.goal = None
+        self.goal_id = None
+        for color in self.colors:
+            for object in self.objects:
+                self.targets[color, object] = Target(self, (color, object), self.drawfuncs[object])
+        self.targets['wild', 'wild'] = Target(self, ('wild', 'wild'), self.drawfuncs['wild'])
+        # Create the edge walls
+        self.walls = [Wall(self, pos) for pos in self.board.walls[:self.board.edges]]
+        self.canvas.tag_raise('wall')
+        
+        
+
+
+    def create_dpad(self, color):
+        dpad = Frame(self.control_frame, width=self.dpadsize, height=self.dpadsize,
+                     takefocus=True, highlightthickness=1, highlightcolor='cyan')
+        dpad.color = color
+        # Create directional buttons
+        dpad.up    = Label(dpad, background=color, borderwidth=1, relief=SOLID)
+        dpad.down  = Label(dpad, background=color, borderwidth=1, relief=SOLID)
+        dpad.left  = Label(dpad, background=color, borderwidth=1, relief=SOLID)
+        dpad.right = Label(dpad, background=color, borderwidth=1, relief=SOLID)
+        # Bind commands to directional buttons
+        dpad.up   .bind('<ButtonRelease-1>', lambda e: self.buttons_enabled and self.move(color, 'up'   ))
+        dpad.down .bind('<ButtonRelease-1>', lambda e: self.buttons_enabled and self.move(color, 'down' ))
+        dpad.left .bind('<ButtonRelease-1>', lambda e: self.buttons_enabled and self.move(color, 'left' ))
+        dpad.right.bind('<ButtonRelease-1>', lambda e: self.buttons_enabled and self.move(color, 'right'))
+        # Bind focus removal to these buttons as well
+        dpad.up   .bind('<ButtonRelease-1>', lambda e: self.buttons_enabled and self.focus_set(), '+')
+        dpad.down .bind('<ButtonRelease-1>', lambda e: self.buttons_enabled and self.focus_set(), '+')
+        dpad.left .bind('<ButtonRelease-1>', lambda e: self.buttons_enabled and self.focus_set(), '+')
+        dpad.right.bind('<ButtonRelease-1>', lambda e: self.buttons_enabled and self.focus_set(), '+')
+        # Position directional buttons
+        dpad.up   .place(relx=0.5 , rely=0.25, relwidth=0.1, relheight=0.3, anchor=CENTER)
+        dpad.down .place(relx=0.5 , rely=0.75, relwidth=0.1, relheight=0.3, anchor=CENTER)
+        dpad.left .place(relx=0.25, rely=0.5 , relwidth=0.3, relheight=0.1, anchor=CENTER)
+        dpad.right.place(relx=0.75, rely=0.5 , relwidth=0.3, relheight=0.1, anchor=CENTER)
+        return dpad
+
+
+
+    def create_controls(self):
+        # Initialize control frame
+        self.control_frame = Frame()
+        self.control_frame.pack(side=LEFT, expand=YES, fill=BOTH)
+        # Create robot control pads
+        self.dpads = []
+        for i, color in enumerate(self.colors):
+            dpad = self.create_dpad(color)
+            dpad.grid(row=i//2, column=3*(i%2), columnspan=3)
+            self.dpads.append(dpad)
+        row = (len(self.colors)+1)//2
+        # Create control buttons
+        self.control_frame.grid_rowconfigure(row, minsize=30) # Add a spacer
+        row += 1
+        test_ttkbutton()
+        self.draw_button = ttkButton(self.control_frame, text='Draw', command=self.draw)
+        self.draw_button.grid(row=row, column=0, padx=10, pady=10, sticky=E+W)
+        self.time_button = ttkButton(self.control_frame, text='Timer', command=self.time)
+        self.time_button.grid(row=row, column=1, padx=10, pady=10, sticky=E+W)
+        self.undo_button = ttkButton(self.control_frame, text='Undo', command=self.undo)
+        self.undo_button.grid(row=row, column=2, padx=10, pady=10, sticky=E+W)
+        self.redo_button = ttkButton(self.control_frame, text='Redo', command=self.redo)
+        self.redo_button.grid(row=row, column=3, padx=10, pady=10, sticky=E+W)
+        self.reset_button = ttkButton(self.control_frame, text='Reset', command=self.reset_robots)
+        self.reset_button.grid(row=row, column=4, padx=10, pady=10, sticky=E+W)
+        self.hint_button = ttkButton(self.control_frame, text='Hint', command=self.hint)
+        self.hint_button.grid(row=row, column=5, padx=10, pady=10, sticky=E+W)
+        # Create move counter
+        self.move_label = Label(self.control_frame)
+        row += 1
+        self.move_label.grid(row=row, column=0, columnspan=6, sticky=E+W)
+        # Create the display of how many moves the targets need
+        self.par_label = Label(self.control_frame)
+        row += 1
+        self.par_label.grid(row=row, column=0, columnspan=6, sticky=E+W)
+        # Create timer display
+        row += 1
+        self.control_frame.grid_rowconfigure(row, minsize=30) # Add a spacer
+        row += 1
+        self.timer_frame = Frame(self.control_frame)
+        self.timer_frame.grid(row=row, column=0, columnspan=6, sticky=N+S+E+W, padx=10, pady=10)
+        self.seconds_label = Label(self.timer_frame, font=('TkDefaultFont', 50))
+        self.seconds_label.pack(side=LEFT, anchor=N+W)
+        self.hundredths_label = Label(self.timer_frame, font=('TkDefaultFont', 12))
+        self.hundredths_label.pack(side=LEFT, anchor=N+W)
+        # Create new game button
+        row += 1
+        self.control_frame.grid_rowconfigure(row, minsize=30, weight=1) # Stretchable spacer
+        row += 1
+        self.new_button = ttkButton(self.control_frame, text='Start new game', command=self.reset_game)
+        self.new_button.grid(row=row, column=0, columnspan=6, sticky=E+W, padx=10, pady=10)
+        # Create undo/redo shortcuts
+        if sys.platform == 'darwin':
+            self.bind('<Command-d>'      , lambda e: self.buttons_enabled and self.draw        ())
+            self.bind('<Command-t>'      , lambda e: self.buttons_enabled and self.time        ())
+            self.bind('<Command-r>'      , lambda e: self.buttons_enabled and self.reset_robots())
+            self.bind('<Command-h>'      , lambda e: self.buttons_enabled and self.hint        ())
+            self.bind('<Command-b>'      , lambda e: self.toggle_bounds())
+            self.bind('<Command-z>'      , lambda e: self.buttons_enabled and self.undo        ())
+            self.bind('<Command-Shift-z>', lambda e: self.buttons_enabled and self.redo        ())
+            self.bind('<Command-y>'      , lambda e: self.buttons_enabled and self.redo        ())
+        else:
+            self.bind('<Control-d>'      , lambda e: self.buttons_enabled and self.draw        ())
+            self.bind('<Control-t>'      , lambda e: self.buttons_enabled and self.time        ())
+            self.bind('<Control-r>'      , lambda e: self.buttons_enabled and self.reset_robots())
+            self.bind('<Control-h>'      , lambda e: self.buttons_enabled and self.hint        ())
+            self.bind('<Control-b>'      , lambda e: self.toggle_bounds())
+            self.bind('<Control-z>'      , lambda e: self.buttons_enabled and self.undo        ())
+            self.bind('<Control-Shift-z>', lambda e: self.buttons_enabled and self.redo        ())
+            self.bind('<Control-y>'      , lambda e: self.buttons_enabled and self.redo        ())
+        # Create arrow shortcuts
+        def func(i):
+            return lambda e: self.dpads[i].focus_set()
+        for i, color in enumerate(self.colors):
+            self.bind(color[0], func(i))
+        self.bind('<Up>'   , lambda e: self.buttons_enabled and self.dpad_move_shortcut('up'   ))
+        self.bind('<Down>' , lambda e: self.buttons_enabled and self.dpad_move_shortcut('down' ))
+        self.bind('<Left>' , lambda e: self.buttons_enabled and self.dpad_move_shortcut('left' ))
+        self.bind('<Right>', lambda e: self.buttons_enabled and self.dpad_move_shortcut('right'))
+
+
+
+    def dpad_move_shortcut(self, direction):
+        dpad = self.focus_get()
+        if dpad and dpad in self.dpads:
+            self.move(dpad.color, direction)
+
+
+
+
+
+    # Callback methods
+
+
+    def is_at_goal(self):
+        # True if the current goal is met, False if not
+        return self.board.is_at_goal()
+
+
+    def update_moves(self):
+        # Update the display after the move index in the stack has changed.
+        self.start_time = None # Cancel the timer if somebody moved
+        self.schedule()
+        if self.updates_enabled:
+            # Update the label accordingly
+            if self.move_index == 0:
+                self.move_label['text'] = ''
+            elif self.move_index == 1:
+                self.move_label['text'] = '1 move'
+            else:
+                self.move_label['text'] = '%d moves' % self.move_index
+            # Update the color of the label depending on if we're in the right place
+            if self.is_at_goal():
+                self.move_label['foreground'] = 'green'    
+            else:
+                self.move_label['foreground'] = 'black'
+            # Update whether the undo/redo buttons are active
+            enable_button(self.undo_button, self.move_index > 0)
+            enable_button(self.redo_button, self.move_index < len(self.moves))
+
+
+    def clear_markers(self):
+        # Update the display after the move stack has been cleared
+        self.update_moves()
+        self.focus_set()
+        for robot in self.robots.values():
+            robot.delete_marker()
+
+
+    def reset_moves(self):
+        # Resets the move stack
+        self.board.reset_moves()
+        self.clear_markers()
+
+
+    def reset_robots(self):
+        # Reset the position of the robots since the last object was drawn.
+        # This doesn't clear the stack, but rather moves back to the beginning of it.
+        # It's functionally equivalent to hitting "undo" as many times as you can.
+        self.board.reset_robots()
+        if self.log is not None:
+            self.log.reset()
+        self.update_moves()
+        self.moving = []
+        for robot in self.robots.values():
+            robot.setpos()
+
+
+    def delete_goal(self):
+        # Delete the goal item from the canvas
+        if self.goal_id is not None:
+            self.canvas.delete(self.goal_id)
+            self.goal_id = None
+            
+
+    def reset_game(self):
+        # Start a new game. Randomize the game board,
+        # clear the stack, and fill the bag back up.
+        if self.difficulty and self.library is None:
+            # Looking for a board in the range of difficulty can take a
+            # while, so it's done in another process, leaving the window
+            # free, and nothing can be played until it turns up
+            if self.finding is None:
+                self.find_puzzle()
+                self.reset_view()
+        elif self.stats is None:
+            self.new_board()
+            self.reset_view()
+        else:
+            start = time.time()
+            self.new_board()
+            middle = time.time()
+            self.reset_view()
+            self.stats.record_time('randomize', middle - start)
+            self.stats.record_time('randomize_view', time.time() - middle)
+
+
+    def load_board(self, n):
+        # Start a new game on board number n from the library
+        self.target_moves = self.library.load(n, self.board)
+        self.reset_view()
+
+
+    def new_board(self):
+        # Randomize the board, or pick one out of the library if there is
+        # one. Boards in a range of difficulty come from find_puzzle().
+        if self.library is not None:
+            self.target_moves = self.library.load(self.board.random.randrange(len(self.library)), self.board)
+        else:
+            self.board.reset_game()
+            self.target_moves = None
+
+
+    def find_puzzle(self):
+        # Wait for the next board where every target needs a number of
+        # moves in the range of difficulty, and keep checking on it until
+        # it turns up. They're looked for in worker processes, one per CPU,
+        # a few games ahead, so the next one is usually ready by the time
+        # it's wanted. They're played in the order they were asked for, not
+        # the order they turn up in, so that the quickest ones to find don't
+        # come up more often than the rest.
+        # Only imported when needed, since it's slow to import
+        import multiprocessing
+        processes = multiprocessing.cpu_count()
+        if self.pool is None:
+            self.pool = multiprocessing.Pool(processes)
+        while len(self.puzzles) < processes + PUZZLES_AHEAD:
+            args = (self.size, self.colors, self.objects, self.board.random.getrandbits(64),
+                    self.difficulty[0], self.difficulty[1], DEFAULT_PUZZLE_SECONDS)
+            self.puzzles.append(self.pool.apply_async(_generate_puzzle, (args,)))
+        self.finding = self.puzzles.pop(0)
+        self.after(int(1000 * PUZZLE_CHECK_SECONDS), self.check_puzzle)
+
+
+    def check_puzzle(self):
+        # Start a game on the board from find_puzzle() if it's ready
+        if not self.finding.ready():
+            self.after(int(1000 * PUZZLE_CHECK_SECONDS), self.check_puzzle)
+            return
+        finding, self.finding = self.finding, None
+        try:
+            layout, self.target_moves = finding.get()
+            self.board.set_layout(layout)
+        except ValueError:
+            # Nothing hard or easy enough turned up, so play an ordinary
+            # random board rather than giving up on the game
+            self.board.reset_game()
+            self.target_moves = None
+        self.enable_controls(True)
+        self.reset_view()
+
+
+    def update_par(self, key=None):
+        # Show the fewest moves the drawn target needs, or the range over
+        # every target before one is drawn, if they are known
+        if self.finding is not None:
+            self.par_label['text'] = 'Looking for a board with %d to %d moves' % tuple(self.difficulty)
+        elif self.target_moves is None:
+            if self.difficulty and self.library is None:
+                self.par_label['text'] = 'No board found with %d to %d moves' % tuple(self.difficulty)
+            else:
+                self.par_label['text'] = ''
+        elif key is not None:
+            # Library boards may not know every target
+            if key in self.target_moves:
+                self.par_label['text'] = 'Can be done in %d moves' % self.target_moves[key]
+            else:
+                self.par_label['text'] = ''
+        elif self.target_moves:
+            counts = distribution(self.target_moves)
+            self.par_label['text'] = 'Targets need %d to %d moves' % (min(counts), max(counts))
+        else:
+            self.par_label['text'] = ''
+
+
+    def reset_view(self):
+        # Redraw everything after the board has been randomized. While a
+        # new board is being looked for, the old one stays on the screen,
+        # but none of the controls work and it isn't logged.
+        if self.log is not None and self.finding is None:
+            self.log.board(self.board)
+        self.randomize_view()
+        self.clear_markers()
+        enable_button(self.draw_button, True)
+        if self.finding is not None:
+            self.enable_controls(False)
+        self.delete_goal()
+        self.update_bounds()
+        self.update_par()
+
+
+    def enable_controls(self, enable):
+        # Turn the buttons, the control pads and the shortcuts on or off
+        self.buttons_enabled = enable
+        for button in (self.draw_button, self.time_button, self.undo_button, self.redo_button,
+                       self.reset_button, self.hint_button, self.new_button):
+            enable_button(button, enable)
+
+
+    def draw(self, key=None):
+        # Draw a new object out of the bag. This removes all the markers and
+        # clears the stack.
+        key = self.board.draw(key)
+        if key is not None:
+            if self.log is not None:
+                self.log.draw(key)
+            self.clear_markers()
+            if not self.bag:
+                enable_button(self.draw_button, False)
+            self.goal = self.targets[key]
+            self.goal.make_goal()
+            self.update_bounds()
+            self.update_par(key)
+
+
+    def time(self):
+        # Toggles the timer, either starts it or clears it.
+        if self.start_time is None:
+            self.start_time = time.time()
+        else:
+            self.start_time = None
+        if self.log is not None:
+            self.log.timer(self.start_time is not None)
+        self.schedule()
+
+
+    def begin_moving(self, robot):
+        # Start moving the indicated robot
+        if self.updates_enabled:
+            self.moving.append((robot, robot.pos))
+            self.schedule()
+
+
+    def move(self, color, direction):
+        # Moves the robot given by "color" in the direction given by "direction".
+        # Return True if the robot actually moved
+        moved = self.board.move(color, direction)
+        if self.log is not None:
+            self.log.move(color, direction)
+        self.robots[color].move()
+        self.update_moves()
+        if self.stats is not None:
+            color, start, end = self.moves[self.move_index-1]
+            self.stats.count('moves')
+            self.stats.record('slide_cells', abs(end[0] - start[0]) + abs(end[1] - start[1]))
+        return moved
+
+
+    def undo(self):
+        # Undo the most recent action if possible
+        move = self.board.undo()
+        if move:
+            if self.log is not None:
+                self.log.undo()
+            self.begin_moving(self.robots[move[0]])
+            self.update_moves()
+
+
+    def redo(self):
+        # Redo the most recent action if possible
+        move = self.board.redo()
+        if move:
+            if self.log is not None:
+                self.log.redo()
+            self.begin_moving(self.robots[move[0]])
+            self.update_moves()
+
+
+        
+
+
+    def hint(self):
+        # Show the next move of a shortest solution from where the robots
+        # are now, and give that robot's control pad the focus so the arrow
+        # keys move it. Return the (color, direction) move, or None.
+        move = self.hinter.hint()
+        if move is None:
+            if not self.is_at_goal():
+                self.move_label['text'] = 'No quick hint' if self.hinter.timed_out else 'No hint'
+                self.move_label['foreground'] = 'black'
+        else:
+            self.move_label['text'] = 'Hint: %s %s' % move
+            self.move_label['foreground'] = 'black'
+            self.dpads[self.colors.index(move[0])].focus_set()
+        return move
+
+
+    def toggle_bounds(self):
+        # Turn the move count overlay on or off
+        self.show_bounds = not self.show_bounds
+        self.update_bounds()
+
+
+    def update_bounds(self):
+        # Label every cell with a lower bound on the number of moves a robot
+        # there needs to reach the current target, or '-' if it never can.
+        # The bounds come from the solver, which works them out once per
+        # target for as long as the walls stay the same.
+        self.canvas.delete('bounds')
+        goal = self.board.goal
+        if not self.show_bounds or self.goal_id is None:
+            return
+        solver = self.hinter.get_solver()
+        bound = solver.lower_bound(solver.cell(self.board.targets[goal]))
+        w, h = self.size
+        center = set(self.center_positions)
+        for x in range(w):
+            for y in range(h):
+                if (x, y) in center:
+                    continue
+                n = bound[solver.cell((x, y))]
+                self.canvas.create_text(((x+.85)*self.cellsize, (y+.85)*self.cellsize),
+                                        text=('-' if n >= w*h else str(n)),
+                                        font=('TkDefaultFont', 8), fill='black', tags='bounds')
+
+
+        
+
+
+    # Function to redraw everything after the board has been randomized
+
+    def randomize(self):
+        self.board.randomize()
+        self.randomize_view()
+
+    def randomize_view(self):
+        # Put the robots and targets where the board placed them
+        for robot in self.robots.values():
+            robot.setpos()
+        for target in self.targets.values():
+            target.setpos()
+        # Move the walls that go with the targets, making new ones or
+        # deleting old ones only if the number of walls has changed
+        edges = self.board.edges
+        positions = self.board.walls[edges:]
+        for wall, pos in zip(self.walls[edges:], positions):
+            wall.setpos(pos)
+        for wall in self.walls[edges+len(positions):]:
+            wall.delete()
+        del self.walls[edges+len(positions):]
+        for pos in positions[len(self.walls)-edges:]:
+            self.walls.append(Wall(self, pos))
+        self.canvas.tag_raise('wall')
+        
+        
+                
+                   
+
+    # Main game loop
+
+    def schedule(self):
+        # Make sure the game loop is running. It stops itself again once
+        # nothing is moving and the timer isn't running.
+        if self.tick_id is None:
+            self.last_tick = time.time()
+            self.tick_id = self.after_idle(self.tick)
+
+
+    def tick(self):
+        # Draw one frame
+        now = time.time()
+        dt = now - self.last_tick
+        self.last_tick = now
+        self.tick_id = None
+        stats = self.stats
+        running = self.update_timer(now)
+        if stats is not None:
+            timer_done = time.time()
+        if self.moving and self.updates_enabled:
+            self.animate(dt)
+        if self.moving or running:
+            self.tick_id = self.after(int(1000 / FRAMES_PER_SECOND), self.tick)
+        if stats is not None:
+            # How long since the last frame (which includes Tk's own work in
+            # between), and how long this one took: the timer label, and
+            # the animation
+            done = time.time()
+            stats.count('frames')
+            stats.record_time('frame_interval', dt)
+            stats.record_time('frame', done - now)
+            stats.record_time('timer', timer_done - now)
+            stats.record_time('animate', done - timer_done)
+
+
+    def update_timer(self, now):
+        # Update the timer. Return True if it's still counting down.
+        if self.start_time is None:
+            if self.seconds_label['text']:
+               self.seconds_label['text'] = self.hundredths_label['text'] = ''
+            return False
+        diff = self.delay - (now - self.start_time)
+        if diff < 0:
+            self.seconds_label['text'] = '0'
+            self.hundredths_label['text'] = '00'
+            return False
+        self.seconds_label['text'] = str(int(diff))
+        self.hundredths_label['text'] = '%.2d' % (int(diff * 100) % 100)
+        return True
+
+
+    def animate(self, dt):
+        # Update the moving objects, given the time since the last frame
+        robot, pos = self.moving[0]
+        delta = slide_step(robot.curpos, pos, CELLS_PER_SECOND * dt)
+        self.canvas.move(robot.robot_id, *[i * self.cellsize for i in delta])
+        if self.stats is not None:
+            self.slide_frames += 1
+        if robot.curpos == list(pos):
+            if robot.pos == robot.origpos == list(pos):
+                robot.delete_marker()
+            robot.draw(pos)
+            del self.moving[0]
+            if self.stats is not None:
+                self.stats.record('slide_frames', self.slide_frames)
+                self.slide_frames = 0
+
+
+    def dump_stats(self):
+        # Write out the stats, and do it again after the interval
+        self.stats.gauge('canvas_items', len(self.canvas.find_all()))
+        self.stats.dump()
+        self.after(int(1000 * self.stats.interval), self.dump_stats)
+
+
+    def run(self):
+        try:
+            self.schedule()
+            self.mainloop()
+        except TclError:
+            try:
+                self.destroy()
+            except TclError:
+                pass
+            sys.exit()
+        finally:
+            if self.log is not None:
+                self.log.close()
+
+
+
+    # Playing back a game log
+
+
+    def play_log(self, path, speed=1.0):
+        # Play back a game log on the screen, speed times as fast as it was
+        # played. The controls are turned off and nothing more is logged
+        # until it's over. Raises ValueError, before anything is played, if
+        # any session in the log was of a different kind of board.
+        events = list(read_log(path))
+        kind = [list(self.size), list(self.colors), list(self.objects)]
+        for event in events:
+            if event[1] == 'game' and list(event[2:5]) != kind:
+                raise ValueError('the log is of a different kind of board')
+        if self.log is not None:
+            self.log.close()
+            self.log = None
+        self.buttons_enabled = False
+        # Events are played in file order. Every session appended to the
+        # log starts its clock at 0 with a 'game' event, so each session is
+        # played straight after the one before, keeping only the gaps
+        # between events within a session.
+        last = None
+        t = 0.0
+        for event in events:
+            if event[1] != 'game' and last is not None:
+                t += max(event[0] - last, 0) / speed
+            last = event[0]
+            self.after(int(1000 * t), self.play_event, event)
+        self.after(int(1000 * t), self.end_playback)
+
+
+    def play_event(self, event):
+        # The 'game' headers were checked before playback started, and
+        # there's nothing else to do for them
+        kind = event[1]
+        if kind == 'board':
+            self.board.set_layout(event[2])
+            self.reset_view()
+        elif kind == 'draw':
+            self.draw((event[2], event[3]))
+        elif kind == 'move':
+            self.move(event[2], event[3])
+        elif kind == 'undo':
+            self.undo()
+        elif kind == 'redo':
+            self.redo()
+        elif kind == 'reset':
+            self.reset_robots()
+        elif kind == 'timer':
+            if (self.start_time is not None) != event[2]:
+                self.time()
+
+
+    def end_playback(self):
+        self.buttons_enabled = True
+            
+        
+            
+            
+        
+        
+            
+        
+# Run the application
+
+if __name__ == '__main__':
+    game = Game()
+    game.run()
+        
+                
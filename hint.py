@@ -0,0 +1,83 @@
+# Ricochet Robots hints
+
+# Works out the next move of an optimal solution from wherever the robots
+# are right now, not from where they started. Solutions are remembered for
+# each target, from every position along them, so following the hints or
+# going back and forth with undo and redo doesn't search again.
+
+from board import DIRECTIONS
+from solver import Solver
+
+
+DEFAULT_HINT_DEPTH = 12
+DEFAULT_HINT_SECONDS = 0.1 # Hints are worked out while the window waits
+
+
+
+class Hinter(object):
+
+    def __init__(self, board, max_depth=DEFAULT_HINT_DEPTH, time_limit=DEFAULT_HINT_SECONDS):
+        # time_limit is how many seconds to look for a solution before giving
+        # up (None to take as long as it takes)
+        self.board = board
+        self.max_depth = max_depth
+        self.time_limit = time_limit
+        self.timed_out = False
+        self.solver = None
+        self.wall_set = None
+        # The rest of an optimal solution (or None if there isn't one within
+        # max_depth moves), keyed by target and then by robot positions
+        self.solutions = {}
+
+
+    def get_solver(self):
+        # Return a solver for the board, making a new one and forgetting
+        # every solution if the walls have changed. The solver keeps the
+        # distance tables for each target it has been asked about.
+        if self.board.wall_set is not self.wall_set:
+            self.wall_set = self.board.wall_set
+            self.solver = Solver(self.board)
+            self.solutions = {}
+        return self.solver
+
+
+    def solution(self, goal=None):
+        # Return a shortest list of (color, direction) moves from where the
+        # robots are now to the goal, which defaults to the board's current
+        # goal. Return None if there is no goal or no solution, or if the
+        # search ran out of time, in which case self.timed_out is set.
+        board = self.board
+        self.timed_out = False
+        if goal is None:
+            goal = board.goal
+            if goal is None:
+                return None
+        solver = self.get_solver()
+        solutions = self.solutions.setdefault(goal, {})
+        colors = board.colors
+        cells = [solver.cell(board.robots[color]) for color in colors]
+        key = tuple(cells)
+        if key in solutions:
+            return solutions[key]
+        solution = solver.solve(goal, max_depth=self.max_depth, time_limit=self.time_limit)
+        if solver.timed_out:
+            # Not remembered, since it isn't known that there's no solution
+            self.timed_out = True
+            return None
+        solutions[key] = solution
+        if solution:
+            # Every position along the way gets the rest of the solution
+            for i, (color, direction) in enumerate(solution[:-1]):
+                n = colors.index(color)
+                cells[n] = solver.slide(cells, n, DIRECTIONS.index(direction))
+                solutions.setdefault(tuple(cells), solution[i+1:])
+        return solution
+
+
+    def hint(self, goal=None):
+        # Return the next (color, direction) move of a shortest solution from
+        # where the robots are now, or None if there isn't one. An empty
+        # solution (the goal is already met) also gives None.
+        solution = self.solution(goal)
+        if solution:
+            return solution[0]
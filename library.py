@@ -0,0 +1,255 @@
+# Ricochet Robots puzzle library
+
+# A library is a file of fixed-width binary board records, so that board
+# number N can be found by seeking straight to it. The file starts with a
+# header:
+#
+#   magic     4 bytes   b'RRLB'
+#   version   uint16
+#   width     uint16
+#   height    uint16
+#   cellsize  uint8     bytes per cell number (1 or 2)
+#   flags     uint8     bit 0 set if records have move counts
+#   names     uint32    length of the names that follow
+#   names     JSON list of the robot colors and the target objects
+#
+# and each record after it is, with all integers little-endian:
+#
+#   walls     4 masks of (width*height+7)//8 bytes, of the cells with a
+#             wall on their up, down, left and right side (bit x + y*w)
+#   robots    one cell number per color
+#   targets   one cell number per target, in Board.targets order
+#   moves     one byte per target, the optimal number of moves to reach
+#             it or 255 if unknown (only if flag bit 0 is set)
+
+import sys
+import json
+import mmap
+import struct
+
+from board import Board
+from bitboard import wall_masks, wall_positions
+
+
+MAGIC = b'RRLB'
+VERSION = 1
+HEADER = struct.Struct('<4sHHHBBI')
+HAS_MOVES = 1
+UNKNOWN_MOVES = 255
+
+
+
+class Format(object):
+
+    # The layout of the records in a library of boards of one size
+
+    def __init__(self, size, colors, objects, has_moves):
+        self.size = w, h = size
+        self.colors = list(colors)
+        self.objects = list(objects)
+        self.has_moves = has_moves
+        self.ntargets = len(colors) * len(objects) + 1
+        self.maskbytes = (w * h + 7) // 8
+        self.cellsize = 1 if w * h <= 256 else 2
+        self.cells = struct.Struct('<%d%s' % (len(colors) + self.ntargets, 'B' if self.cellsize == 1 else 'H'))
+        self.moves = struct.Struct('<%dB' % (self.ntargets if has_moves else 0))
+        self.record_size = 4 * self.maskbytes + self.cells.size + self.moves.size
+
+    def header(self):
+        # Return the header for a library file in this format
+        names = json.dumps([self.colors, self.objects]).encode('ascii')
+        return HEADER.pack(MAGIC, VERSION, self.size[0], self.size[1], self.cellsize,
+                           HAS_MOVES if self.has_moves else 0, len(names)) + names
+
+    @classmethod
+    def from_header(cls, data):
+        # Read the format out of the start of a library file. Return the
+        # format and the size of the header.
+        magic, version, w, h, cellsize, flags, length = HEADER.unpack_from(data, 0)
+        if magic != MAGIC or version != VERSION:
+            raise ValueError('not a version %d board library' % VERSION)
+        colors, objects = json.loads(bytes(data[HEADER.size:HEADER.size+length]).decode('ascii'))
+        return cls((w, h), tuple(colors), tuple(objects), bool(flags & HAS_MOVES)), HEADER.size + length
+
+    def pack(self, board, moves=None):
+        # Return the record for a board, and optionally a dict giving the
+        # optimal number of moves to each target.
+        w = self.size[0]
+        data = b''.join([mask.to_bytes(self.maskbytes, 'little')
+                         for mask in wall_masks(self.size, board.walls)])
+        cells = [x + y*w for x, y in [board.robots[color] for color in board.colors]]
+        cells += [x + y*w for x, y in board.targets.values()]
+        data += self.cells.pack(*cells)
+        if self.has_moves:
+            moves = moves or {}
+            data += self.moves.pack(*[moves.get(key, UNKNOWN_MOVES) for key in board.targets])
+        return data
+
+    def unpack(self, data, offset=0):
+        # Read a record straight out of a buffer. Return the wall masks, the
+        # robot cells, the target cells and the move counts (or None).
+        n = self.maskbytes
+        view = memoryview(data)
+        masks = [int.from_bytes(view[offset+i*n:offset+(i+1)*n], 'little') for i in range(4)]
+        offset += 4 * n
+        cells = self.cells.unpack_from(data, offset)
+        offset += self.cells.size
+        moves = self.moves.unpack_from(data, offset) if self.has_moves else None
+        return masks, cells[:len(self.colors)], cells[len(self.colors):], moves
+
+
+
+class LibraryWriter(object):
+
+    # Appends boards to a new library file
+
+    def __init__(self, path, size, colors, objects, has_moves=False):
+        self.format = Format(size, colors, objects, has_moves)
+        self.file = open(path, 'wb')
+        self.file.write(self.format.header())
+        self.count = 0
+
+    def add(self, board, moves=None):
+        # Write a board, and optionally a dict of the optimal number of
+        # moves to each target
+        self.file.write(self.format.pack(board, moves))
+        self.count += 1
+
+    def close(self):
+        self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+
+class Library(object):
+
+    # A memory-mapped library file, indexed by board number
+
+    def __init__(self, path):
+        self.file = open(path, 'rb')
+        self.map = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+        self.format, self.offset = Format.from_header(self.map)
+        self.size = self.format.size
+        self.colors = self.format.colors
+        self.objects = self.format.objects
+
+    def __len__(self):
+        return (len(self.map) - self.offset) // self.format.record_size
+
+    def record(self, n):
+        # Return a read-only view of the bytes of record n, without copying
+        if not (0 <= n < len(self)):
+            raise IndexError('board number out of range')
+        start = self.offset + n * self.format.record_size
+        return memoryview(self.map)[start:start+self.format.record_size]
+
+    def __getitem__(self, n):
+        # Return the wall masks, robot cells, target cells and move counts
+        # of board number n
+        return self.format.unpack(self.record(n))
+
+    def load(self, n, board):
+        # Put board number n onto a Board of the right size. Return a dict
+        # giving the optimal number of moves to each target, or None if the
+        # library doesn't have them.
+        masks, robots, targets, moves = self[n]
+        w = self.size[0]
+        board.set_positions(wall_positions(self.size, masks),
+                            dict([(color, (cell % w, cell // w)) for color, cell in zip(board.colors, robots)]),
+                            dict([(key, (cell % w, cell // w)) for key, cell in zip(board.targets, targets)]))
+        if moves is not None:
+            return dict([(key, n) for key, n in zip(board.targets, moves) if n != UNKNOWN_MOVES])
+
+    def close(self):
+        self.map.close()
+        self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+
+def format_board(board, moves=None):
+    # Return a human-readable drawing of a board, followed by where every
+    # robot and target is. moves is an optional dict giving the optimal
+    # number of moves to each target.
+    w, h = board.size
+    walls = board.wall_set
+    cells = {}
+    for pos in board.center_positions:
+        cells[pos] = '##'
+    for key, pos in board.targets.items():
+        cells[pos] = '**' if key[0] == 'wild' else (key[0][0] + key[1][0])
+    for color, pos in board.robots.items():
+        cells[pos] = color[0].upper() + cells.get(pos, ' ')[0]
+    lines = []
+    for y in range(h):
+        line = '+'
+        for x in range(w):
+            line += ('--' if (y == 0) or ((2*x, 2*y-1) in walls) else '  ') + '+'
+        lines.append(line)
+        line = ''
+        for x in range(w):
+            line += ('|' if (x == 0) or ((2*x-1, 2*y) in walls) else ' ') + cells.get((x, y), '  ')
+        lines.append(line + '|')
+    lines.append('+' + '--+' * w)
+    for color, pos in board.robots.items():
+        lines.append('%s robot: %d, %d' % (color, pos[0], pos[1]))
+    for key, pos in board.targets.items():
+        line = '%s %s: %d, %d' % (key[0], key[1], pos[0], pos[1])
+        if moves and key in moves:
+            line += ' (%d moves)' % moves[key]
+        lines.append(line)
+    return '\n'.join(lines) + '\n'
+
+
+
+# Build a library, or print boards out of one
+
+if __name__ == '__main__':
+    import argparse
+    from generator import generate, generate_puzzle
+    from solver import Solver, DEFAULT_REACH_DEPTH
+    parser = argparse.ArgumentParser(description='Build or read a Ricochet Robots board library.')
+    commands = parser.add_subparsers(dest='command')
+    build = commands.add_parser('build', help='generate boards into a new library')
+    build.add_argument('path')
+    build.add_argument('n', type=int, help='number of boards')
+    build.add_argument('--seed', type=int, default=None)
+    build.add_argument('--size', type=int, nargs=2, default=(16, 16))
+    build.add_argument('--moves', type=int, nargs=2, metavar=('MIN', 'MAX'),
+                       help='only keep boards where every target needs MIN to MAX moves')
+    build.add_argument('--solve', action='store_true',
+                       help='store the optimal move counts (up to %d moves)' % DEFAULT_REACH_DEPTH)
+    show = commands.add_parser('show', help='print boards from a library as text')
+    show.add_argument('path')
+    show.add_argument('numbers', type=int, nargs='*', help='board numbers (default all)')
+    args = parser.parse_args()
+    if args.command == 'build':
+        size = tuple(args.size)
+        board = Board(size, seed=args.seed, randomize=False)
+        with LibraryWriter(args.path, size, board.colors, board.objects,
+                           has_moves=bool(args.moves or args.solve)) as writer:
+            if args.moves:
+                for i in range(args.n):
+                    writer.add(board, generate_puzzle(board, *args.moves))
+            else:
+                for layout in generate(args.n, args.seed, size):
+                    board.set_layout(layout)
+                    writer.add(board, Solver(board).distances() if args.solve else None)
+    elif args.command == 'show':
+        with Library(args.path) as library:
+            board = Board(library.size, library.colors, library.objects, randomize=False)
+            for n in (args.numbers or range(len(library))):
+                moves = library.load(n, board)
+                sys.stdout.write('Board #%d\n%s\n' % (n, format_board(board, moves)))
+    else:
+        parser.print_help()
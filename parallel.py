@@ -0,0 +1,397 @@
+# Ricochet Robots parallel solver
+
+# Solves with the same iterative deepening A* search as Solver, with the
+# first few moves of each iteration expanded here and the subtrees under
+# them searched by a pool of worker processes. The workers share one hash
+# table of packed robot positions in shared memory, holding how many moves
+# were left when each position was searched, so a position near the top of
+# a subtree searched by any worker is never searched again by another with
+# fewer moves left. Further down, where most of the positions are, each
+# worker only keeps its own table, like Solver's.
+#
+# The table is written without locks. Two workers racing for the same slot
+# can at worst both search the same position, or lose track of one, which
+# only costs extra work. A position is marked before its subtree is
+# searched, so a worker that skips a position another is still searching
+# only misses solutions that the other one will find. Every limit is
+# searched to the end before the next one, so the first solution found is
+# still an optimal one.
+
+import multiprocessing
+from multiprocessing import shared_memory
+
+from board import DIRECTIONS
+from solver import Solver, DEFAULT_MAX_DEPTH, TIME_CHECK_NODES
+
+
+DEFAULT_TABLE_SIZE = 1 << 22 # Slots, at 8 bytes each
+MAX_PROBES = 32
+REMAINING_BITS = 6 # Low bits of each slot, holding the moves left
+KEY_BITS = 50 # Bits above those, holding the packed positions
+GENERATION_BITS = 63 - KEY_BITS - REMAINING_BITS # And above those, which solve wrote the slot
+TASKS_PER_PROCESS = 4 # Subtrees to split each iteration into, per process
+SERIAL_SECONDS = 0.1 # How long to try the ordinary solver first
+SHARED_REMAINING = 4 # Fewest moves left for a position to go in the shared table
+
+
+
+class SharedTable(object):
+
+    # An open-addressing hash table in shared memory, mapping positive keys
+    # below 2**KEY_BITS to how many moves were left when they were searched.
+    # Each slot also says which generation wrote it, and slots from any
+    # other generation count as empty, so the table only needs clearing
+    # when the generations run out rather than for every solve.
+
+    def __init__(self, size=DEFAULT_TABLE_SIZE, name=None):
+        # Make a new table, or attach to an existing one by name
+        self.size = size
+        if name is None:
+            self.memory = shared_memory.SharedMemory(create=True, size=8*size)
+        else:
+            self.memory = shared_memory.SharedMemory(name=name)
+        self.name = self.memory.name
+        self.slots = self.memory.buf.cast('q')
+
+    def visit(self, key, remaining, generation):
+        # Record that the position with this key is being searched with
+        # remaining moves left. Return False if it has already been searched
+        # with at least as many in this generation, so it needn't be again.
+        # If the table is too full to find room, act as if it's new.
+        slots = self.slots
+        mask = self.size - 1
+        slot = (key * 0x9E3779B97F4A7C15 >> 17) & mask
+        key |= generation << KEY_BITS
+        for i in range(MAX_PROBES):
+            found = slots[slot]
+            if found >> REMAINING_BITS == key:
+                if found & ((1 << REMAINING_BITS) - 1) >= remaining:
+                    return False
+                slots[slot] = (key << REMAINING_BITS) | remaining
+                return True
+            if found >> (KEY_BITS + REMAINING_BITS) != generation:
+                slots[slot] = (key << REMAINING_BITS) | remaining
+                return True
+            slot = (slot + 1) & mask
+        return True
+
+    def clear(self):
+        self.memory.buf[:] = bytes(8 * self.size)
+
+    def close(self):
+        self.slots.release()
+        self.memory.close()
+
+    def unlink(self):
+        self.memory.unlink()
+
+
+
+# Worker processes
+
+_worker = None
+
+
+class _Stopped(Exception):
+    pass
+
+
+class _Worker(object):
+
+    def __init__(self, board, table_name, table_size, stop):
+        self.solver = Solver(board)
+        self.table = SharedTable(table_size, table_name)
+        self.stop = stop
+        self.bits = max(self.solver.ncells - 1, 1).bit_length()
+        self.generation = None
+        self.seen = {}
+
+    def search(self, wild, target, cells, remaining, generation):
+        # Search for a way to the target cell in up to remaining moves from
+        # the robots at the given cells, with the one that has to reach it
+        # first unless the target is wild. Return the list of (robot number,
+        # direction number) moves, or None, and how many positions were
+        # looked at. Gives up with None if another worker finds a solution.
+        # The generation is the one to use in the table.
+        solver = self.solver
+        bound = solver.lower_bound(target)
+        # Every position this worker has searched in this solve, by the same
+        # key as Solver uses, kept from one task to the next. Only the ones
+        # with at least SHARED_REMAINING moves left also go in the shared
+        # table, since there are few enough of those for the sorting and
+        # probing to pay for themselves.
+        if generation != self.generation:
+            self.generation = generation
+            self.seen = {}
+        seen = self.seen
+        slots = self.table.slots
+        mask = self.table.size - 1
+        remaining_mask = (1 << REMAINING_BITS) - 1
+        generation_shift = KEY_BITS + REMAINING_BITS
+        generation_key = generation << KEY_BITS
+        stop = self.stop
+        bits = self.bits
+        n = len(cells)
+        ncells = solver.ncells
+        cell_moves = solver.cell_moves
+        robot_order = list(range(n))
+        goal_only = [0]
+        # The moves of the solution, last first, filled in on the way back
+        # out of the search
+        path = []
+        nodes = [0]
+
+        def search(cells, occupied, remaining):
+            if wild:
+                h = min([bound[cell] for cell in cells])
+            else:
+                h = bound[cells[0]]
+            if h == 0:
+                return True
+            if h > remaining:
+                return False
+            k = occupied if wild else (occupied | (cells[0] << ncells))
+            if seen.get(k, -1) >= remaining:
+                return False
+            seen[k] = remaining
+            if remaining >= SHARED_REMAINING:
+                # Same as table.visit(_key(cells, wild, bits), remaining,
+                # generation), written out here since it's done so often
+                key = 0
+                for cell in (sorted(cells) if wild else [cells[0]] + sorted(cells[1:])):
+                    key = (key << bits) | cell
+                key += 1
+                slot = (key * 0x9E3779B97F4A7C15 >> 17) & mask
+                key |= generation_key
+                for probe in range(MAX_PROBES):
+                    found = slots[slot]
+                    if found >> REMAINING_BITS == key:
+                        if found & remaining_mask >= remaining:
+                            return False
+                        slots[slot] = (key << REMAINING_BITS) | remaining
+                        break
+                    if found >> generation_shift != generation:
+                        slots[slot] = (key << REMAINING_BITS) | remaining
+                        break
+                    slot = (slot + 1) & mask
+            nodes[0] += 1
+            if not (nodes[0] % TIME_CHECK_NODES) and stop.value:
+                raise _Stopped()
+            # If the goal robot needs every remaining move, it's the only
+            # robot worth moving.
+            tight = (h == remaining) and not wild
+            remaining -= 1
+            for i in (goal_only if tight else robot_order):
+                cell = cells[i]
+                others = occupied ^ (1 << cell)
+                for d, stop_cell, ray, delta in cell_moves[cell]:
+                    # Stop short of the nearest robot in the way, if any
+                    blockers = ray & occupied
+                    if not blockers:
+                        end = stop_cell
+                    else:
+                        if delta > 0:
+                            end = (blockers & -blockers).bit_length() - 1 - delta
+                        else:
+                            end = blockers.bit_length() - 1 - delta
+                        if end == cell:
+                            continue
+                    # Don't bother calling the search for a goal robot
+                    # that can't make it from there
+                    if i == 0 and not wild and bound[end] > remaining:
+                        continue
+                    cells[i] = end
+                    if search(cells, others | (1 << end), remaining):
+                        cells[i] = cell
+                        path.append((i, d))
+                        return True
+                    cells[i] = cell
+            return False
+
+        # Don't start on subtrees that were handed out before the solution
+        # turned up
+        if stop.value:
+            return None, 0
+        occupied = 0
+        for cell in cells:
+            occupied |= 1 << cell
+        try:
+            if search(list(cells), occupied, remaining):
+                return path[::-1], nodes[0]
+        except _Stopped:
+            pass
+        return None, nodes[0]
+
+
+def _key(cells, wild, bits):
+    # Return the table key for the robots at the given cells. All robots
+    # other than the first, which needs to reach the goal, are
+    # interchangeable, so the others are sorted. Adding one keeps zero free
+    # for empty slots.
+    if wild:
+        cells = sorted(cells)
+    else:
+        cells = [cells[0]] + sorted(cells[1:])
+    key = 0
+    for cell in cells:
+        key = (key << bits) | cell
+    return key + 1
+
+
+def _init_worker(board, table_name, table_size, stop):
+    global _worker
+    _worker = _Worker(board, table_name, table_size, stop)
+
+
+def _search(task):
+    # Run one numbered task, and say which one it was along with the result
+    i, args = task
+    return (i,) + _worker.search(*args)
+
+
+
+class ParallelSolver(object):
+
+    # Solves positions on one board with a pool of worker processes. Close
+    # it (or use it in a with statement) to shut the pool down. Each solve
+    # gives the ordinary solver serial_seconds to find it on its own first.
+
+    def __init__(self, board, processes=None, table_size=DEFAULT_TABLE_SIZE,
+                 serial_seconds=SERIAL_SECONDS):
+        self.board = board
+        self.processes = processes or multiprocessing.cpu_count()
+        self.serial_seconds = serial_seconds
+        self.solver = Solver(board)
+        self.bits = max(self.solver.ncells - 1, 1).bit_length()
+        if self.bits * len(board.colors) > KEY_BITS:
+            raise ValueError('too many robots to pack into the shared table')
+        self.table = SharedTable(table_size)
+        self.generation = 0
+        # Set by the first worker to find a solution, to call off the others
+        self.stop = multiprocessing.RawValue('b', 0)
+        self.pool = multiprocessing.Pool(self.processes, _init_worker,
+                                         (board, self.table.name, table_size, self.stop))
+        self.nodes = 0
+
+    def close(self):
+        self.pool.close()
+        self.pool.join()
+        self.table.close()
+        self.table.unlink()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def solve(self, goal=None, robots=None, max_depth=DEFAULT_MAX_DEPTH):
+        # Return a shortest list of (color, direction) moves that reaches the
+        # goal, or None if there isn't one within max_depth moves. Takes the
+        # same arguments as Solver.solve(), and finds a solution of the same
+        # length.
+        board = self.board
+        if goal is None:
+            goal = board.goal
+        if robots is None:
+            robots = board.robots
+        if max_depth >= 1 << REMAINING_BITS:
+            raise ValueError('max_depth must be below %d' % (1 << REMAINING_BITS))
+        # Most positions are solved quicker than the workers could even be
+        # handed them, so only bring them in if that takes a while, and
+        # then only for the limits the ordinary solver didn't finish
+        solution = self.solver.solve(goal, robots, max_depth, time_limit=self.serial_seconds)
+        if not self.solver.timed_out:
+            self.nodes = self.solver.nodes
+            return solution
+        searched = self.solver.depth
+        colors = list(board.colors)
+        wild = (goal[0] == 'wild')
+        if not wild:
+            # Put the robot that has to reach the goal first
+            colors.remove(goal[0])
+            colors.insert(0, goal[0])
+        cells = [self.solver.cell(robots[color]) for color in colors]
+        target = self.solver.cell(board.targets[goal])
+        bound = self.solver.lower_bound(target)
+        h = min([bound[cell] for cell in cells]) if wild else bound[cells[0]]
+        if h == 0:
+            return []
+        # The table holds how many moves were left, which only goes up from
+        # one limit to the next, so it's kept for the whole solve. Each solve
+        # gets a new generation, so the last one's entries don't count.
+        self.generation += 1
+        if self.generation >> GENERATION_BITS:
+            self.table.clear()
+            self.generation = 1
+        self.nodes = self.solver.nodes
+        for limit in range(max(h, searched), max_depth + 1):
+            path = self.search(wild, target, cells, limit)
+            if path is not None:
+                return [(colors[i], DIRECTIONS[d]) for i, d in path]
+        return None
+
+    def search(self, wild, target, cells, limit):
+        # One iteration of the search, for solutions of up to limit moves.
+        # Return the list of (robot number, direction number) moves, or None.
+        frontier, depth = self.split(wild, target, cells, limit)
+        if depth is None:
+            return frontier
+        tasks = [(wild, target, start, limit - depth, self.generation) for start, path in frontier]
+        found = None
+        # Wait for every task even once one has found the goal, so that no
+        # worker is still writing to the table when the next solve starts
+        for i, path, nodes in self.pool.imap_unordered(_search, enumerate(tasks)):
+            self.nodes += nodes
+            if path is not None and found is None:
+                found = frontier[i][1] + path
+                self.stop.value = 1
+        self.stop.value = 0
+        return found
+
+    def split(self, wild, target, cells, limit):
+        # Expand the first few moves of the search, with the same pruning as
+        # the workers use, until there are enough positions to hand out.
+        # Return a list of (cells, path) pairs and how many moves they're at,
+        # or a solution and None if one turned up this early.
+        bound = self.solver.lower_bound(target)
+        n = len(cells)
+        moves = [(d, self.solver.stops[d], self.solver.rays[d], self.solver.deltas[d]) for d in range(4)]
+        seen = {}
+        frontier = [(cells, [])]
+        depth = 0
+        while depth < limit and len(frontier) < self.processes * TASKS_PER_PROCESS:
+            remaining = limit - depth
+            next_frontier = []
+            for cells, path in frontier:
+                h = min([bound[cell] for cell in cells]) if wild else bound[cells[0]]
+                occupied = 0
+                for cell in cells:
+                    occupied |= 1 << cell
+                for i in (range(1) if (h == remaining and not wild) else range(n)):
+                    cell = cells[i]
+                    for d, stops, rays, delta in moves:
+                        # Stop short of the nearest robot in the way, if any
+                        blockers = rays[cell] & occupied
+                        if not blockers:
+                            end = stops[cell]
+                        elif delta > 0:
+                            end = (blockers & -blockers).bit_length() - 1 - delta
+                        else:
+                            end = blockers.bit_length() - 1 - delta
+                        if end == cell:
+                            continue
+                        child = cells[:i] + [end] + cells[i+1:]
+                        child_h = min([bound[c] for c in child]) if wild else bound[child[0]]
+                        if child_h == 0:
+                            return path + [(i, d)], None
+                        if child_h > remaining - 1:
+                            continue
+                        key = _key(child, wild, self.bits)
+                        if seen.get(key, -1) >= remaining - 1:
+                            continue
+                        seen[key] = remaining - 1
+                        next_frontier.append((child, path + [(i, d)]))
+            frontier = next_frontier
+            depth += 1
+        return frontier, depth
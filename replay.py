@@ -0,0 +1,192 @@
+# Ricochet Robots game logs
+
+# A game log is an append-only text file with one event per line, each a
+# JSON list starting with the number of seconds since the log was opened
+# and the kind of event:
+#
+#   [t, 'game', [w, h], colors, objects, wall clock time]
+#   [t, 'board', layout]              a new board, as from Board.get_layout()
+#   [t, 'draw', color, object]
+#   [t, 'move', color, direction]
+#   [t, 'undo']
+#   [t, 'redo']
+#   [t, 'reset']                      the robots went back to the start
+#   [t, 'timer', running]             the timer was started or stopped
+#
+# Writes are buffered, so logging a move costs a list, a json.dumps() and
+# a string append. A Replayer plays logs back onto a Board without a
+# display, as fast as it can, and keeps statistics about how people played.
+#
+#   python replay.py LOG...           print statistics about logged games
+
+import sys
+import json
+import time
+
+from board import Board
+
+
+DEFAULT_BUFFER_SIZE = 1 << 16
+
+
+
+class GameLog(object):
+
+    def __init__(self, path, buffer_size=DEFAULT_BUFFER_SIZE):
+        self.file = open(path, 'a', buffering=buffer_size)
+        self.start = time.time()
+
+    def write(self, kind, *args):
+        event = [round(time.time() - self.start, 3), kind]
+        event.extend(args)
+        self.file.write(json.dumps(event, separators=(',', ':')) + '\n')
+
+    def game(self, board):
+        # Start a new game log for the given kind of board
+        self.write('game', list(board.size), list(board.colors), list(board.objects), self.start)
+
+    def board(self, board):
+        self.write('board', [list(part) for part in board.get_layout()])
+
+    def draw(self, key):
+        self.write('draw', key[0], key[1])
+
+    def move(self, color, direction):
+        self.write('move', color, direction)
+
+    def undo(self):
+        self.write('undo')
+
+    def redo(self):
+        self.write('redo')
+
+    def reset(self):
+        self.write('reset')
+
+    def timer(self, running):
+        self.write('timer', running)
+
+    def flush(self):
+        self.file.flush()
+
+    def close(self):
+        self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+
+def read_log(path):
+    # Iterate over the events in a log file, skipping a last line that was
+    # cut off part way through being written
+    with open(path) as f:
+        for line in f:
+            try:
+                yield json.loads(line)
+            except ValueError:
+                pass
+
+
+
+class Replayer(object):
+
+    # Plays game logs back onto a board, keeping count of what happened.
+    # For every drawn target it records how long it took and how many moves
+    # were on the stack when the goal was first met, or that it never was.
+
+    def __init__(self):
+        self.board = None
+        self.games = 0
+        self.boards = 0
+        self.draws = 0
+        self.moves = 0
+        self.undos = 0
+        self.solve_times = []
+        self.solve_moves = []
+        self.unsolved = 0
+        self.draw_time = None
+
+    def replay(self, events):
+        # Play a sequence of events, as from read_log()
+        for event in events:
+            self.apply(event)
+        self.finish_draw()
+
+    def apply(self, event):
+        # Play one event on the board
+        t, kind = event[:2]
+        board = self.board
+        if kind == 'game':
+            self.finish_draw()
+            size, colors, objects = event[2:5]
+            self.board = Board(tuple(size), tuple(colors), tuple(objects), randomize=False)
+            self.games += 1
+        elif kind == 'board':
+            self.finish_draw()
+            board.set_layout(event[2])
+            self.boards += 1
+        elif kind == 'draw':
+            self.finish_draw()
+            board.draw((event[2], event[3]))
+            self.draws += 1
+            self.draw_time = t
+        elif kind == 'move':
+            board.move(event[2], event[3])
+            self.moves += 1
+            self.check_goal(t)
+        elif kind == 'undo':
+            board.undo()
+            self.undos += 1
+        elif kind == 'redo':
+            board.redo()
+            self.check_goal(t)
+        elif kind == 'reset':
+            board.reset_robots()
+
+    def check_goal(self, t):
+        if self.draw_time is not None and self.board.is_at_goal():
+            self.solve_times.append(t - self.draw_time)
+            self.solve_moves.append(self.board.move_index)
+            self.draw_time = None
+
+    def finish_draw(self):
+        # A target that's still out when the next one is drawn (or the board
+        # or the game changes) was never solved
+        if self.draw_time is not None:
+            self.unsolved += 1
+            self.draw_time = None
+
+    def format(self):
+        # Return the statistics as text
+        lines = ['%d games, %d boards, %d targets drawn, %d moves, %d undos'
+                 % (self.games, self.boards, self.draws, self.moves, self.undos)]
+        solved = len(self.solve_times)
+        if solved:
+            lines.append('%d targets solved, %d not, in %.1fs and %.1f moves on average'
+                         % (solved, self.unsolved, sum(self.solve_times) / solved,
+                            float(sum(self.solve_moves)) / solved))
+            counts = {}
+            for n in self.solve_moves:
+                counts[n] = counts.get(n, 0) + 1
+            for n in sorted(counts):
+                lines.append('%3d moves: %d' % (n, counts[n]))
+        return '\n'.join(lines) + '\n'
+
+
+
+if __name__ == '__main__':
+    import argparse
+    parser = argparse.ArgumentParser(description='Replay Ricochet Robots game logs and print statistics.')
+    parser.add_argument('logs', nargs='+')
+    args = parser.parse_args()
+    replayer = Replayer()
+    start = time.time()
+    for path in args.logs:
+        replayer.replay(read_log(path))
+    elapsed = time.time() - start
+    sys.stdout.write(replayer.format())
+    sys.stderr.write('%d games replayed in %.2fs\n' % (replayer.games, elapsed))
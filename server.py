@@ -0,0 +1,492 @@
+# Ricochet Robots game server
+
+# Hosts any number of rooms, each with its own board, without a display.
+# Players join a room, draw targets, bid the number of moves they need and
+# then show their solutions, which the server checks by playing them out on
+# its board with the same rules as Game.move. Bidding closes a fixed delay
+# after the first bid, timed by the server.
+#
+# Messages are dicts with a 'type', sent as one JSON object per line over a
+# socket, or as they are over an in-process queue. Clients send:
+#
+#   {'type': 'join', 'room': name, 'player': name}
+#   {'type': 'draw'}                         draw the next target
+#   {'type': 'bid', 'moves': n}              bid (or lower a bid)
+#   {'type': 'solve', 'moves': [[color, direction], ...]}
+#   {'type': 'new'}                          start a new game on a new board
+#
+# A player who joins gets {'type': 'state', ...} with everything about the
+# room. After that, every change goes to everybody in the room as
+# {'type': 'diff', ...} holding only the parts of the state that changed.
+# Anything the server can't accept gets {'type': 'error', 'message': ...}.
+#
+#   python server.py --socket PATH           serve on a Unix socket
+#   python server.py --port N                serve on a TCP port
+#   python server.py --load-test ROOMS       time in-process rooms
+
+import sys
+import json
+import random
+import asyncio
+
+from board import Board, DEFAULT_BOARD_SIZE, DEFAULT_DELAY_SECONDS, COLORS, OBJECTS, DIRECTIONS
+from verify import Verifier
+
+
+# The phases of a round
+WAITING = 'waiting' # for somebody to draw a target
+BIDDING = 'bidding'
+SOLVING = 'solving' # the best bidder shows their solution
+SOLVED = 'solved'   # the round is over, draw again
+FINISHED = 'finished' # every target has been drawn
+
+
+
+# Transports. A connection has a receive() coroutine that returns the next
+# message or None when the other end has gone, and send() and close()
+# methods that don't block.
+
+class QueueConnection(object):
+
+    # One end of an in-process connection. Messages are passed as they are,
+    # without being encoded.
+
+    def __init__(self, incoming, outgoing):
+        self.incoming = incoming
+        self.outgoing = outgoing
+
+    async def receive(self):
+        return await self.incoming.get()
+
+    def send(self, message):
+        self.outgoing.put_nowait(message)
+
+    def close(self):
+        self.outgoing.put_nowait(None)
+
+
+def queue_pair():
+    # Return the two ends of a new in-process connection
+    a = asyncio.Queue()
+    b = asyncio.Queue()
+    return QueueConnection(a, b), QueueConnection(b, a)
+
+
+class StreamConnection(object):
+
+    # A connection over an asyncio stream, one JSON message per line
+
+    def __init__(self, reader, writer):
+        self.reader = reader
+        self.writer = writer
+
+    async def receive(self):
+        try:
+            line = await self.reader.readline()
+        except ConnectionError:
+            return None
+        if not line:
+            return None
+        try:
+            message = json.loads(line.decode('utf-8'))
+        except ValueError:
+            return line # Not JSON, so it's turned away like any other non-object
+        # A JSON null isn't the other end going away
+        return line if message is None else message
+
+    def send(self, message):
+        if not self.writer.is_closing():
+            self.writer.write(json.dumps(message, separators=(',', ':')).encode('utf-8') + b'\n')
+
+    def close(self):
+        self.writer.close()
+
+
+
+def require(message, *keys):
+    # Raise ValueError, naming what's missing, unless the message has all
+    # the given keys
+    missing = [key for key in keys if key not in message]
+    if missing:
+        raise ValueError('%s messages need %s' % (message.get('type'), ', '.join(["'%s'" % key for key in missing])))
+
+
+def diff(old, new):
+    # Return the entries of the state dict new that differ from old. Entries
+    # that are dicts are compared key by key, and keys that have gone are
+    # sent as None.
+    changes = {}
+    for key, value in new.items():
+        before = old.get(key)
+        if isinstance(value, dict) and isinstance(before, dict):
+            sub = dict([(k, v) for k, v in value.items() if before.get(k) != v])
+            for k in before:
+                if k not in value:
+                    sub[k] = None
+            if sub:
+                changes[key] = sub
+        elif value != before:
+            changes[key] = value
+    return changes
+
+
+
+def apply_diff(state, changes):
+    # The client side of diff(): bring a copy of the state up to date. The
+    # dicts in messages are never changed, as in-process connections share
+    # them with the server and every other player.
+    for key, value in changes.items():
+        if isinstance(value, dict) and isinstance(state.get(key), dict):
+            state[key] = entries = dict(state[key])
+            for k, v in value.items():
+                if v is None:
+                    entries.pop(k, None)
+                else:
+                    entries[k] = v
+        else:
+            state[key] = value
+
+
+
+class Room(object):
+
+    # One board and the players at it
+
+    def __init__(self, server, name, seed=None):
+        self.server = server
+        self.name = name
+        self.board = Board(server.size, server.colors, server.objects, seed)
+        self.players = {} # Connections, keyed by player name
+        self.scores = {}
+        self.bids = {}    # (moves, order) pairs, keyed by player name
+        self.bid_count = 0
+        self.solvers = [] # Who gets to show a solution, best bid first
+        self.phase = WAITING
+        self.countdown = None
+        self.timer = None
+        self.layout = self.get_layout()
+        self.verifier = Verifier(self.board)
+        self.sent = self.state()
+
+
+    def get_layout(self):
+        # The walls, robots and targets of the board as JSON-friendly lists
+        return [list(part) for part in self.board.get_layout()]
+
+
+    def state(self):
+        # Return everything a player needs to know about the room
+        board = self.board
+        return {
+            'room': self.name,
+            'size': list(board.size),
+            'colors': list(board.colors),
+            'objects': list(board.objects),
+            'layout': self.layout,
+            'robots': dict([(color, list(pos)) for color, pos in board.robots.items()]),
+            'goal': list(board.goal) if board.goal else None,
+            'left': len(board.bag),
+            'phase': self.phase,
+            'countdown': self.countdown,
+            'bids': dict([(player, bid[0]) for player, bid in self.bids.items()]),
+            'solver': self.solvers[0] if self.solvers else None,
+            'scores': dict(self.scores),
+            }
+
+
+    def broadcast(self):
+        # Send what has changed since last time to everybody in the room
+        state = self.state()
+        changes = diff(self.sent, state)
+        self.sent = state
+        if changes:
+            changes['type'] = 'diff'
+            for connection in self.players.values():
+                connection.send(changes)
+
+
+
+    # Players coming and going
+
+    def join(self, player, connection):
+        if player in self.players:
+            raise ValueError('%s is already in room %s' % (player, self.name))
+        self.scores.setdefault(player, 0)
+        self.broadcast()
+        self.players[player] = connection
+        message = dict(self.sent)
+        message['type'] = 'state'
+        connection.send(message)
+
+
+    def leave(self, player):
+        del self.players[player]
+        self.bids.pop(player, None)
+        if player in self.solvers:
+            if self.solvers[0] == player:
+                self.next_solver()
+            else:
+                self.solvers.remove(player)
+        if self.players:
+            self.broadcast()
+        else:
+            self.cancel_timer()
+            self.server.close_room(self)
+
+
+
+    # Messages from players
+
+    def handle(self, player, message):
+        kind = message.get('type')
+        if kind == 'draw':
+            self.draw()
+        elif kind == 'bid':
+            require(message, 'moves')
+            self.bid(player, message['moves'])
+        elif kind == 'solve':
+            require(message, 'moves')
+            self.solve(player, message['moves'])
+        elif kind == 'new':
+            self.new_game()
+        else:
+            raise ValueError('unknown message type %r' % (kind,))
+        self.broadcast()
+
+
+    def draw(self):
+        if self.phase not in (WAITING, SOLVED):
+            raise ValueError('the current round is still going')
+        if self.board.draw() is None:
+            self.phase = FINISHED
+        else:
+            self.phase = BIDDING
+            self.bids = {}
+            self.solvers = []
+
+
+    def bid(self, player, moves):
+        if self.phase != BIDDING:
+            raise ValueError('bidding is closed')
+        if not isinstance(moves, int) or isinstance(moves, bool) or moves < 1:
+            raise ValueError('a bid has to be a positive number of moves')
+        if player in self.bids and self.bids[player][0] <= moves:
+            raise ValueError('bids can only go down')
+        # Ties go to whoever bid first
+        self.bid_count += 1
+        self.bids[player] = (moves, self.bid_count)
+        if self.timer is None:
+            self.countdown = self.server.delay
+            self.timer = asyncio.get_event_loop().call_later(self.server.delay, self.close_bidding)
+
+
+    def close_bidding(self):
+        # Called by the timer
+        self.timer = None
+        self.countdown = None
+        self.solvers = sorted(self.bids, key=self.bids.get)
+        self.phase = SOLVING if self.solvers else SOLVED
+        self.broadcast()
+
+
+    def cancel_timer(self):
+        if self.timer is not None:
+            self.timer.cancel()
+            self.timer = None
+            self.countdown = None
+
+
+    def solve(self, player, moves):
+        # Play out a solution from where the robots are. If it gets the
+        # robot to the goal in no more moves than were bid, the robots stay
+        # where it left them and the player gets the target. Otherwise the
+        # next best bidder gets a turn.
+        if self.phase != SOLVING or self.solvers[0] != player:
+            raise ValueError("it isn't %s's turn to solve" % player)
+        valid, count, positions = self.verifier.verify(moves)
+        if valid and count <= self.bids[player][0]:
+            self.board.robots.update(positions)
+            self.board.reset_moves()
+            self.scores[player] += 1
+            self.phase = SOLVED
+            self.solvers = []
+        else:
+            self.next_solver()
+
+
+    def next_solver(self):
+        del self.solvers[0]
+        if not self.solvers:
+            self.phase = SOLVED
+
+
+    def new_game(self):
+        self.cancel_timer()
+        self.board.reset_game()
+        self.layout = self.get_layout()
+        self.verifier = Verifier(self.board)
+        self.phase = WAITING
+        self.bids = {}
+        self.solvers = []
+
+
+
+class Server(object):
+
+    def __init__(self, size=DEFAULT_BOARD_SIZE, colors=COLORS, objects=OBJECTS,
+                 delay=DEFAULT_DELAY_SECONDS, seed=None):
+        self.size = size
+        self.colors = colors
+        self.objects = objects
+        self.delay = delay
+        self.random = random.Random(seed)
+        self.rooms = {}
+
+
+    def get_room(self, name):
+        # Return the room with the given name, opening it if need be
+        room = self.rooms.get(name)
+        if room is None:
+            room = self.rooms[name] = Room(self, name, self.random.getrandbits(64))
+        return room
+
+
+    def close_room(self, room):
+        del self.rooms[room.name]
+
+
+    async def handle(self, connection):
+        # Talk to one player until they go away
+        player = room = None
+        try:
+            while True:
+                message = await connection.receive()
+                if message is None:
+                    break
+                try:
+                    # Either transport can bring anything at all
+                    if not isinstance(message, dict):
+                        raise ValueError('messages have to be JSON objects')
+                    if message.get('type') == 'join':
+                        if room is not None:
+                            raise ValueError('already in room %s' % room.name)
+                        require(message, 'room', 'player')
+                        room = self.get_room(str(message['room']))
+                        player = str(message['player'])
+                        try:
+                            room.join(player, connection)
+                        except ValueError:
+                            if not room.players:
+                                self.close_room(room)
+                            room = None
+                            raise
+                    elif room is None:
+                        raise ValueError('join a room first')
+                    else:
+                        room.handle(player, message)
+                except (KeyError, TypeError, ValueError) as e:
+                    connection.send({'type': 'error', 'message': str(e)})
+        finally:
+            if room is not None:
+                room.leave(player)
+            connection.close()
+
+
+    def connect(self):
+        # Return the client end of a new in-process connection
+        client, server = queue_pair()
+        asyncio.ensure_future(self.handle(server))
+        return client
+
+
+    async def serve_unix(self, path):
+        return await asyncio.start_unix_server(self.handle_stream, path)
+
+
+    async def serve_tcp(self, host, port):
+        return await asyncio.start_server(self.handle_stream, host, port)
+
+
+    async def handle_stream(self, reader, writer):
+        await self.handle(StreamConnection(reader, writer))
+
+
+
+# Load testing with in-process connections
+
+async def play(server, room, player, players, rounds, rng):
+    # Join a room and keep bidding and guessing at solutions for a number of
+    # rounds. Return how many messages came back from the server.
+    connection = server.connect()
+    connection.send({'type': 'join', 'room': room, 'player': player})
+    # Everybody joins before the first draw, and p0 does all the drawing
+    state = {}
+    received = played = 0
+    while played < rounds:
+        message = await connection.receive()
+        received += 1
+        if message['type'] == 'error':
+            continue
+        before = state.get('phase')
+        joined = len(state.get('scores', ()))
+        apply_diff(state, message)
+        phase = state['phase']
+        if phase in (WAITING, SOLVED):
+            if phase == SOLVED and before != SOLVED:
+                played += 1
+            if player == 'p0' and len(state['scores']) == players and \
+                    (phase != before or joined != players):
+                connection.send({'type': 'draw'})
+        elif phase == FINISHED:
+            if player == 'p0':
+                connection.send({'type': 'new'})
+        elif phase == BIDDING and before != BIDDING:
+            connection.send({'type': 'bid', 'moves': rng.randint(1, 10)})
+        elif phase == SOLVING and state.get('solver') == player and message.get('solver') == player:
+            moves = [[rng.choice(state['colors']), rng.choice(DIRECTIONS)] for i in range(3)]
+            connection.send({'type': 'solve', 'moves': moves})
+    connection.close()
+    return received
+
+
+async def load_test(rooms, players, rounds, delay, seed=None):
+    import time
+    server = Server(delay=delay, seed=seed)
+    rng = random.Random(seed)
+    start = time.time()
+    results = await asyncio.gather(*[play(server, 'room%d' % i, 'p%d' % j, players, rounds, rng)
+                                     for i in range(rooms) for j in range(players)])
+    elapsed = time.time() - start
+    sys.stdout.write('%d rooms, %d players each, %d rounds: %.2fs, %d messages out (%.0f/s)\n'
+                     % (rooms, players, rounds, elapsed, sum(results), sum(results) / elapsed))
+
+
+if __name__ == '__main__':
+    import argparse
+    parser = argparse.ArgumentParser(description='Run a Ricochet Robots game server.')
+    parser.add_argument('--socket', help='path of a Unix socket to serve on')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, help='TCP port to serve on')
+    parser.add_argument('--delay', type=float, default=DEFAULT_DELAY_SECONDS,
+                        help='seconds bidding stays open after the first bid')
+    parser.add_argument('--seed', type=int, default=None)
+    parser.add_argument('--load-test', type=int, metavar='ROOMS',
+                        help='play this many rooms in-process and report how long it took')
+    parser.add_argument('--players', type=int, default=4, help='players per room in a load test')
+    parser.add_argument('--rounds', type=int, default=3, help='rounds per player in a load test')
+    args = parser.parse_args()
+    if args.load_test:
+        asyncio.run(load_test(args.load_test, args.players, args.rounds,
+                              args.delay if args.delay != DEFAULT_DELAY_SECONDS else 0.01, args.seed))
+    elif args.socket or args.port:
+        async def serve():
+            server = Server(delay=args.delay, seed=args.seed)
+            if args.socket:
+                listener = await server.serve_unix(args.socket)
+            else:
+                listener = await server.serve_tcp(args.host, args.port)
+            async with listener:
+                await listener.serve_forever()
+        asyncio.run(serve())
+    else:
+        parser.print_help()
@@ -0,0 +1,414 @@
+# Ricochet Robots solver service
+
+# Solves puzzles for any number of clients at once, and remembers every
+# answer in an SQLite file, so that a board and target that come round
+# again are answered without searching. Searches run in a pool of worker
+# processes. A puzzle that's asked for again while it's still being solved
+# waits for the search already running instead of starting another.
+#
+# A puzzle is keyed by a hash of everything that decides its answer: the
+# board size, colors and objects, the layout (as from Board.get_layout(),
+# which includes where the robots are) and the goal. The file holds at most
+# a fixed number of answers, and forgets the least recently used ones first.
+#
+# Messages are dicts, sent as one JSON object per line over a socket, or as
+# they are over an in-process queue, as with the game server. Clients send
+#
+#   {'type': 'solve', 'id': n, 'size': [w, h], 'colors': [...], 'objects': [...],
+#    'layout': layout, 'goal': [color, object], 'max_depth': n}
+#
+# (see puzzle()), and get back, in whatever order the answers are ready,
+#
+#   {'type': 'solution', 'id': n, 'moves': [[color, direction], ...], 'cached': bool}
+#
+# with 'moves' None if there's no solution within max_depth moves, or
+# {'type': 'error', 'id': n, 'message': ...}. The service searches no deeper
+# than its own max_depth, whatever the client asks for, and gives up on a
+# search that takes longer than its time limit, with an error.
+#
+#   python service.py --socket PATH          serve on a Unix socket
+#   python service.py --port N               serve on a TCP port
+#   python service.py --load-test N          solve N boards with many clients
+
+import sys
+import json
+import socket
+import sqlite3
+import asyncio
+import hashlib
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+from board import Board, DEFAULT_BOARD_SIZE, COLORS, OBJECTS
+from solver import Solver, DEFAULT_MAX_DEPTH
+from server import StreamConnection, queue_pair, require
+
+
+DEFAULT_CACHE_PATH = 'solutions.db'
+DEFAULT_MAX_ENTRIES = 100000
+FLUSH_EVERY = 1000 # Cache hits between writing out when rows were used
+MAX_DEPTH_LIMIT = 30 # Deepest search a client can have
+DEFAULT_SOLVE_SECONDS = 30.0 # Longest one search can take
+
+
+
+def puzzle(board, goal=None, max_depth=DEFAULT_MAX_DEPTH):
+    # Return a solve request for the board as it is now. The goal defaults
+    # to the board's current goal.
+    if goal is None:
+        goal = board.goal
+    return {'type': 'solve', 'size': list(board.size), 'colors': list(board.colors),
+            'objects': list(board.objects), 'layout': [list(part) for part in board.get_layout()],
+            'goal': list(goal), 'max_depth': max_depth}
+
+
+def puzzle_key(request):
+    # Return the cache key for a solve request
+    require(request, 'size', 'colors', 'objects', 'layout', 'goal')
+    text = json.dumps([request['size'], request['colors'], request['objects'],
+                       request['layout'], request['goal']], separators=(',', ':'))
+    return hashlib.sha1(text.encode('utf-8')).hexdigest()
+
+
+def solve_puzzle(request):
+    # Solve a request in a worker process. Return a list of [color, direction]
+    # moves, or None. Raises TimeoutError if the request has a time_limit and
+    # the search took longer than that.
+    board = Board(tuple(request['size']), tuple(request['colors']), tuple(request['objects']),
+                  randomize=False)
+    board.set_layout(request['layout'])
+    goal = tuple(request['goal'])
+    if goal not in board.targets:
+        raise ValueError('no such target: %r' % (goal,))
+    solver = Solver(board)
+    solution = solver.solve(goal, max_depth=request['max_depth'], time_limit=request.get('time_limit'))
+    if solver.timed_out:
+        raise TimeoutError('gave up after %g seconds' % request['time_limit'])
+    if solution is None:
+        return None
+    return [list(move) for move in solution]
+
+
+
+class SolutionCache(object):
+
+    # Solutions in an SQLite file, keyed by puzzle_key(). Solutions are
+    # shortest ones, so one that's too long still answers a request for a
+    # shallower search: there isn't one. Each row also records how deep the
+    # search went, so that "no solution within 10 moves" doesn't answer a
+    # request to look 20 moves deep. Rows are stamped with a counter every
+    # time they're used, and the ones with the oldest stamps go when there
+    # are more than max_entries.
+    #
+    # Reading doesn't write anything: the new stamps are kept here and
+    # written out every FLUSH_EVERY hits, before evicting and on closing.
+    # A cache is only used by one thread at a time, though not always the
+    # one that opened it.
+
+    def __init__(self, path=DEFAULT_CACHE_PATH, max_entries=DEFAULT_MAX_ENTRIES):
+        self.max_entries = max_entries
+        self.db = sqlite3.connect(path, check_same_thread=False)
+        self.db.execute('PRAGMA journal_mode=WAL')
+        self.db.execute('PRAGMA synchronous=NORMAL')
+        self.db.execute('CREATE TABLE IF NOT EXISTS solutions '
+                        '(key TEXT PRIMARY KEY, moves TEXT, depth INTEGER, used INTEGER)')
+        self.db.execute('CREATE INDEX IF NOT EXISTS solutions_used ON solutions (used)')
+        self.db.commit()
+        self.entries, used = self.db.execute('SELECT COUNT(*), MAX(used) FROM solutions').fetchone()
+        self.clock = used or 0
+        self.used = {}
+        self.hits = 0
+        self.misses = 0
+        self.evict()
+
+    def get(self, key, max_depth):
+        # Return (True, moves) if the answer for key is known to max_depth
+        # moves, or (False, None)
+        row = self.db.execute('SELECT moves, depth FROM solutions WHERE key = ?', (key,)).fetchone()
+        if row is not None:
+            moves, depth = row
+            moves = json.loads(moves)
+            if moves is not None or depth >= max_depth:
+                if moves is not None and len(moves) > max_depth:
+                    moves = None
+                self.clock += 1
+                self.used[key] = self.clock
+                if len(self.used) >= FLUSH_EVERY:
+                    self.flush()
+                self.hits += 1
+                return True, moves
+        self.misses += 1
+        return False, None
+
+    def put(self, key, moves, max_depth):
+        self.clock += 1
+        if self.db.execute('SELECT 1 FROM solutions WHERE key = ?', (key,)).fetchone() is None:
+            self.entries += 1
+        self.db.execute('INSERT OR REPLACE INTO solutions VALUES (?, ?, ?, ?)',
+                        (key, json.dumps(moves, separators=(',', ':')), max_depth, self.clock))
+        self.used.pop(key, None)
+        self.evict()
+
+    def flush(self):
+        # Write out the stamps of the rows used since the last flush
+        if self.used:
+            self.db.executemany('UPDATE solutions SET used = ? WHERE key = ?',
+                                [(used, key) for key, used in self.used.items()])
+            self.used = {}
+            self.db.commit()
+
+    def evict(self):
+        # Forget the least recently used solutions beyond max_entries
+        if self.entries > self.max_entries:
+            self.flush()
+            self.db.execute('DELETE FROM solutions WHERE key IN '
+                            '(SELECT key FROM solutions ORDER BY used LIMIT ?)',
+                            (self.entries - self.max_entries,))
+            self.entries = self.max_entries
+        self.db.commit()
+
+    def close(self):
+        self.flush()
+        self.db.close()
+
+
+
+class SolverService(object):
+
+    def __init__(self, path=DEFAULT_CACHE_PATH, processes=None, max_entries=DEFAULT_MAX_ENTRIES,
+                 max_depth=MAX_DEPTH_LIMIT, time_limit=DEFAULT_SOLVE_SECONDS):
+        # processes is the number of worker processes (default one per CPU).
+        # Requests are searched no deeper than max_depth, and a search that
+        # takes longer than time_limit seconds is given up on, so that no
+        # one request can keep a worker to itself.
+        self.cache = SolutionCache(path, max_entries)
+        self.max_depth = max_depth
+        self.time_limit = time_limit
+        self.executor = ProcessPoolExecutor(processes)
+        # The cache is only touched from this thread, to keep the disk off
+        # the event loop
+        self.database = ThreadPoolExecutor(1)
+        # Searches that are running now, keyed by puzzle_key(), as futures
+        # that everybody asking for that puzzle waits on
+        self.pending = {}
+        self.searches = 0
+        self.coalesced = 0
+
+
+    async def solve(self, request):
+        # Return the solution to a solve request, and whether it came from
+        # the cache
+        key = puzzle_key(request)
+        max_depth = min(int(request.get('max_depth', DEFAULT_MAX_DEPTH)), self.max_depth)
+        loop = asyncio.get_running_loop()
+        pending = self.pending.get(key)
+        if pending is not None and pending.max_depth >= max_depth:
+            self.coalesced += 1
+            moves, cached = await asyncio.shield(pending)
+            if moves is not None and len(moves) > max_depth:
+                moves = None
+            return moves, cached
+        # Anybody else asking while the cache is read waits too, so that
+        # they don't both miss and both search
+        pending = self.pending[key] = loop.create_future()
+        pending.max_depth = max_depth
+        try:
+            cached, moves = await loop.run_in_executor(self.database, self.cache.get, key, max_depth)
+            if not cached:
+                self.searches += 1
+                # A search that runs out of time raises, so it isn't cached
+                moves = await loop.run_in_executor(
+                    self.executor, solve_puzzle, dict(request, max_depth=max_depth, time_limit=self.time_limit))
+                await loop.run_in_executor(self.database, self.cache.put, key, moves, max_depth)
+            pending.set_result((moves, cached))
+        except Exception as e:
+            pending.set_exception(e)
+            pending.exception() # Waiters get it, so don't warn if there are none
+            raise
+        finally:
+            if self.pending.get(key) is pending:
+                del self.pending[key]
+            if not pending.done():
+                pending.cancel()
+        return moves, cached
+
+
+    async def answer(self, connection, message):
+        # Answer one message from a client
+        if not isinstance(message, dict):
+            connection.send({'type': 'error', 'id': None, 'message': 'messages have to be JSON objects'})
+            return
+        try:
+            if message.get('type') != 'solve':
+                raise ValueError('unknown message type %r' % message.get('type'))
+            moves, cached = await self.solve(message)
+            connection.send({'type': 'solution', 'id': message.get('id'), 'moves': moves, 'cached': cached})
+        except Exception as e:
+            # Anything wrong with the request, whether found here or by the
+            # worker that tried to solve it
+            connection.send({'type': 'error', 'id': message.get('id'), 'message': str(e)})
+
+
+    async def handle(self, connection):
+        # Talk to one client until they go away, answering each request as
+        # soon as it's ready rather than in order
+        tasks = set()
+        try:
+            while True:
+                message = await connection.receive()
+                if message is None:
+                    break
+                task = asyncio.ensure_future(self.answer(connection, message))
+                tasks.add(task)
+                task.add_done_callback(tasks.discard)
+            if tasks:
+                await asyncio.wait(tasks)
+        finally:
+            connection.close()
+
+
+    def connect(self):
+        # Return the client end of a new in-process connection
+        client, service = queue_pair()
+        asyncio.ensure_future(self.handle(service))
+        return client
+
+
+    async def serve_unix(self, path):
+        return await asyncio.start_unix_server(self.handle_stream, path)
+
+
+    async def serve_tcp(self, host, port):
+        return await asyncio.start_server(self.handle_stream, host, port)
+
+
+    async def handle_stream(self, reader, writer):
+        await self.handle(StreamConnection(reader, writer))
+
+
+    def format(self):
+        # Return the cache and search counts as text
+        return ('%d cache hits, %d misses, %d searches, %d requests answered along with another, %d entries\n'
+                % (self.cache.hits, self.cache.misses, self.searches, self.coalesced, self.cache.entries))
+
+
+    def close(self):
+        self.executor.shutdown()
+        self.database.submit(self.cache.close).result()
+        self.database.shutdown()
+
+
+
+class ServiceClient(object):
+
+    # A blocking client for a service on a Unix socket, one request at a
+    # time, for scripts and the like
+
+    def __init__(self, path):
+        self.socket = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.socket.connect(path)
+        self.file = self.socket.makefile('rwb')
+        self.count = 0
+
+    def solve(self, board, goal=None, max_depth=DEFAULT_MAX_DEPTH):
+        # Return a shortest list of (color, direction) moves for the board
+        # as it is now, or None, as with Solver.solve()
+        self.count += 1
+        request = puzzle(board, goal, max_depth)
+        request['id'] = self.count
+        self.file.write(json.dumps(request, separators=(',', ':')).encode('utf-8') + b'\n')
+        self.file.flush()
+        line = self.file.readline()
+        if not line:
+            raise ConnectionError('the solver service went away')
+        reply = json.loads(line.decode('utf-8'))
+        if reply['type'] == 'error':
+            raise ValueError(reply['message'])
+        if reply['moves'] is None:
+            return None
+        return [tuple(move) for move in reply['moves']]
+
+    def close(self):
+        self.file.close()
+        self.socket.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+
+# Load testing with in-process connections
+
+async def ask(service, requests):
+    # Send every request on one connection and wait for all the answers.
+    # Return how many came from the cache.
+    connection = service.connect()
+    for i, request in enumerate(requests):
+        connection.send(dict(request, id=i))
+    cached = 0
+    for i in range(len(requests)):
+        message = await connection.receive()
+        if message['type'] == 'error':
+            raise ValueError(message['message'])
+        cached += message['cached']
+    connection.close()
+    return cached
+
+
+async def load_test(service, n, clients, seed=None, max_depth=DEFAULT_MAX_DEPTH):
+    # Have a number of clients all ask for the same n puzzles at once, then
+    # do it again once they've been solved
+    import time
+    board = Board(DEFAULT_BOARD_SIZE, COLORS, OBJECTS, seed=seed, randomize=False)
+    requests = []
+    for i in range(n):
+        board.reset_game()
+        requests.append(puzzle(board, board.draw(), max_depth))
+    for attempt in ('cold', 'warm'):
+        start = time.time()
+        results = await asyncio.gather(*[ask(service, requests) for i in range(clients)])
+        elapsed = time.time() - start
+        sys.stdout.write('%s: %d clients, %d puzzles each: %.2fs, %d answers from the cache\n'
+                         % (attempt, clients, n, elapsed, sum(results)))
+    sys.stdout.write(service.format())
+
+
+if __name__ == '__main__':
+    import argparse
+    parser = argparse.ArgumentParser(description='Run a Ricochet Robots solver service.')
+    parser.add_argument('--socket', help='path of a Unix socket to serve on')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, help='TCP port to serve on')
+    parser.add_argument('--cache', default=DEFAULT_CACHE_PATH, help='SQLite file to keep solutions in')
+    parser.add_argument('--max-entries', type=int, default=DEFAULT_MAX_ENTRIES,
+                        help='most solutions to keep in the cache')
+    parser.add_argument('--processes', type=int, default=None, help='worker processes')
+    parser.add_argument('--max-depth', type=int, default=MAX_DEPTH_LIMIT,
+                        help='deepest search to do for any request')
+    parser.add_argument('--time-limit', type=float, default=DEFAULT_SOLVE_SECONDS,
+                        help='seconds to spend on one search before giving up')
+    parser.add_argument('--seed', type=int, default=None)
+    parser.add_argument('--load-test', type=int, metavar='N',
+                        help='solve N random boards in-process and report how long it took')
+    parser.add_argument('--clients', type=int, default=8, help='clients in a load test')
+    args = parser.parse_args()
+    if not (args.load_test or args.socket or args.port):
+        parser.print_help()
+        sys.exit()
+    async def run():
+        service = SolverService(args.cache, args.processes, args.max_entries, args.max_depth, args.time_limit)
+        try:
+            if args.load_test:
+                await load_test(service, args.load_test, args.clients, args.seed)
+                return
+            if args.socket:
+                listener = await service.serve_unix(args.socket)
+            else:
+                listener = await service.serve_tcp(args.host, args.port)
+            async with listener:
+                await listener.serve_forever()
+        finally:
+            service.close()
+    asyncio.run(run())
@@ -0,0 +1,364 @@
+# Ricochet Robots solver
+
+# Finds an optimal (shortest) sequence of moves that gets a robot to the
+# goal, using iterative deepening A* over packed robot positions.
+
+import time
+
+from board import DIRECTIONS
+from bitboard import BitBoard
+
+
+DEFAULT_MAX_DEPTH = 20
+DEFAULT_REACH_DEPTH = 6
+TIME_CHECK_NODES = 1024 # How many positions to look at between looking at the clock
+
+
+class OutOfTime(Exception):
+    pass
+
+
+
+class Solver(object):
+
+    # Holds everything about a board that doesn't depend on where the robots
+    # are, so that it can be reused for any number of solves on that board.
+
+    def __init__(self, board):
+        self.board = board
+        self.bitboard = BitBoard.from_board(board)
+        self.size = board.size
+        self.colors = board.colors
+        self.ncells = self.bitboard.ncells
+        # Stop tables and rays, indexed by direction number and then by cell number
+        self.deltas = self.bitboard.deltas
+        self.stops = self.bitboard.stops
+        self.rays = self.bitboard.rays
+        # The (direction, stop, ray, step) of every way a robot in each cell
+        # can move at all. A wall right next to it keeps it from going that
+        # way wherever the other robots are, so the search never tries.
+        self.cell_moves = [[(d, self.stops[d][cell], self.rays[d][cell], self.deltas[d])
+                            for d in range(4) if self.stops[d][cell] != cell]
+                           for cell in range(self.ncells)]
+        # Shared with the board, so that the maps are only worked out once
+        # for as long as the walls stay the same
+        self.lower_bounds = board.lower_bounds
+        # For every cell, the cells a robot on its own slides to it from,
+        # worked out the first time solo_distance() needs them
+        self.sources = None
+        self.nodes = 0
+        self.timed_out = False
+        # The move limit the last search had got up to, with every limit
+        # below it already searched without finding the goal
+        self.depth = 0
+
+
+    def cell(self, pos):
+        # Convert an (x, y) position into a cell number
+        return self.bitboard.cell(pos)
+
+
+    def pos(self, cell):
+        # Convert a cell number into an (x, y) position
+        return self.bitboard.pos(cell)
+
+
+    def lower_bound(self, goal):
+        # Return a list giving, for every cell, a lower bound on the number of
+        # moves a robot needs to get from there to the goal cell. This pretends
+        # a robot can stop anywhere along its path (as if another robot were
+        # in the way), so it never overestimates.
+        bound = self.lower_bounds.get(goal)
+        if bound is None:
+            bound = self.lower_bounds[goal] = [None] * self.ncells
+            bound[goal] = 0
+            frontier = [goal]
+            depth = 0
+            while frontier:
+                depth += 1
+                next_frontier = []
+                for cell in frontier:
+                    # Any cell that can slide into or through this one is
+                    # one move further away.
+                    for d in range(4):
+                        delta = self.deltas[d ^ 1]
+                        stops = self.stops[d]
+                        prev = cell
+                        while True:
+                            prev += delta
+                            if not (0 <= prev < self.ncells) or (stops[prev] != stops[cell]):
+                                break
+                            if bound[prev] is None:
+                                bound[prev] = depth
+                                next_frontier.append(prev)
+                frontier = next_frontier
+            # Cells that can never reach the goal get an impossible bound
+            for cell in range(self.ncells):
+                if bound[cell] is None:
+                    bound[cell] = self.ncells
+        return bound
+
+
+    def solo_distance(self, goal):
+        # Return a list giving, for every cell, the fewest moves a robot
+        # needs to get from there to the goal cell with no other robots on
+        # the board, or self.ncells if it never can. Unlike lower_bound(),
+        # this is the real number for a robot on its own.
+        if self.sources is None:
+            self.sources = [[] for cell in range(self.ncells)]
+            for stops in self.stops:
+                for cell, stop in enumerate(stops):
+                    if stop != cell:
+                        self.sources[stop].append(cell)
+        distance = [self.ncells] * self.ncells
+        distance[goal] = 0
+        frontier = [goal]
+        depth = 0
+        while frontier:
+            depth += 1
+            next_frontier = []
+            for cell in frontier:
+                for source in self.sources[cell]:
+                    if distance[source] == self.ncells:
+                        distance[source] = depth
+                        next_frontier.append(source)
+            frontier = next_frontier
+        return distance
+
+
+    def lower_bound_maps(self):
+        # Return a dict giving the lower_bound() list for every target that
+        # has been placed on the board, keyed by (color, object)
+        return dict([(key, self.lower_bound(self.cell(pos)))
+                     for key, pos in self.board.targets.items() if pos is not None])
+
+
+    def slide(self, robots, i, d):
+        # Return the cell that robot number i would stop at if it moved in
+        # direction number d.
+        occupied = 0
+        for cell in robots:
+            occupied |= 1 << cell
+        return self.bitboard.slide(robots[i], d, occupied)
+
+
+    def levels(self, robots=None):
+        # Breadth-first search from the robots' positions, one move deeper at
+        # a time. After each level, yield the depth and a list with a dict
+        # for each robot, mapping every cell that robot has been able to stop
+        # at so far to the fewest moves it takes to get there.
+        if robots is None:
+            robots = self.board.robots
+        cells = tuple([self.cell(robots[color]) for color in self.colors])
+        reached = [{cell: 0} for cell in cells]
+        n = len(cells)
+        cell_moves = self.cell_moves
+        occupied = 0
+        for cell in cells:
+            occupied |= 1 << cell
+        seen = set([cells])
+        frontier = [(cells, occupied)]
+        depth = 0
+        yield depth, reached
+        while frontier:
+            depth += 1
+            next_frontier = []
+            for cells, occupied in frontier:
+                for i in range(n):
+                    cell = cells[i]
+                    for d, stop, ray, delta in cell_moves[cell]:
+                        # Stop short of the nearest robot in the way, if any
+                        blockers = ray & occupied
+                        if not blockers:
+                            end = stop
+                        else:
+                            if delta > 0:
+                                end = (blockers & -blockers).bit_length() - 1 - delta
+                            else:
+                                end = blockers.bit_length() - 1 - delta
+                            if end == cell:
+                                continue
+                        state = cells[:i] + (end,) + cells[i+1:]
+                        if state in seen:
+                            continue
+                        seen.add(state)
+                        next_frontier.append((state, occupied ^ (1 << cell) ^ (1 << end)))
+                        if end not in reached[i]:
+                            reached[i][end] = depth
+            frontier = next_frontier
+            yield depth, reached
+
+
+    def target_moves(self, reached):
+        # Given the robot distances from levels(), return a dict giving the
+        # optimal number of moves to every target that has been reached.
+        moves = {}
+        for key, pos in self.board.targets.items():
+            cell = self.cell(pos)
+            if key[0] == 'wild':
+                depths = [r[cell] for r in reached if cell in r]
+                if depths:
+                    moves[key] = min(depths)
+            else:
+                r = reached[self.colors.index(key[0])]
+                if cell in r:
+                    moves[key] = r[cell]
+        return moves
+
+
+    def distances(self, max_depth=DEFAULT_REACH_DEPTH, robots=None):
+        # Return a dict giving the optimal number of moves to every target
+        # (including the wild one) on the board, from one breadth-first
+        # search. Targets that take more than max_depth moves are left out.
+        for depth, reached in self.levels(robots):
+            moves = self.target_moves(reached)
+            if (depth >= max_depth) or (len(moves) == len(self.board.targets)):
+                break
+        return moves
+
+
+    def solve(self, goal=None, robots=None, max_depth=DEFAULT_MAX_DEPTH, time_limit=None,
+              min_depth=0):
+        # Return a shortest list of (color, direction) moves that reaches the
+        # goal, or None if there isn't one within max_depth moves. The goal
+        # is a target key, and defaults to the board's current goal. The
+        # robots default to where they are on the board right now. If a
+        # time limit is given, in seconds, the search gives up after that
+        # long, returns None and sets self.timed_out. If the goal is already
+        # known to need at least min_depth moves, the search starts there.
+        board = self.board
+        self.timed_out = False
+        deadline = None if time_limit is None else time.time() + time_limit
+        if goal is None:
+            goal = board.goal
+        if robots is None:
+            robots = board.robots
+        colors = list(self.colors)
+        if goal[0] != 'wild':
+            # Put the robot that has to reach the goal first
+            colors.remove(goal[0])
+            colors.insert(0, goal[0])
+        cells = [self.cell(robots[color]) for color in colors]
+        target = self.cell(board.targets[goal])
+        bound = self.lower_bound(target)
+        wild = (goal[0] == 'wild')
+        n = len(cells)
+        ncells = self.ncells
+        cell_moves = self.cell_moves
+        robot_order = list(range(n))
+        goal_only = [0]
+        seen = {}
+        # The moves of the solution, last first, filled in on the way back
+        # out of the search
+        path = []
+
+        def search(cells, occupied, remaining):
+            if wild:
+                h = min([bound[cell] for cell in cells])
+            else:
+                h = bound[cells[0]]
+            if h == 0:
+                return True
+            if h > remaining:
+                return False
+            # The occupancy mask says where the robots are without saying
+            # which is which, so all robots other than the one that needs
+            # to reach the goal are interchangeable.
+            k = occupied if wild else (occupied | (cells[0] << ncells))
+            if seen.get(k, -1) >= remaining:
+                return False
+            seen[k] = remaining
+            if deadline is not None and not (len(seen) % TIME_CHECK_NODES) and time.time() > deadline:
+                raise OutOfTime()
+            # If the goal robot needs every remaining move, it's the only
+            # robot worth moving.
+            tight = (h == remaining) and not wild
+            remaining -= 1
+            for i in (goal_only if tight else robot_order):
+                cell = cells[i]
+                others = occupied ^ (1 << cell)
+                for d, stop, ray, delta in cell_moves[cell]:
+                    # Stop short of the nearest robot in the way, if any
+                    blockers = ray & occupied
+                    if not blockers:
+                        end = stop
+                    else:
+                        if delta > 0:
+                            end = (blockers & -blockers).bit_length() - 1 - delta
+                        else:
+                            end = blockers.bit_length() - 1 - delta
+                        if end == cell:
+                            continue
+                    # Don't bother calling the search for a goal robot
+                    # that can't make it from there
+                    if i == 0 and not wild and bound[end] > remaining:
+                        continue
+                    cells[i] = end
+                    if search(cells, others | (1 << end), remaining):
+                        cells[i] = cell
+                        path.append((i, d))
+                        return True
+                    cells[i] = cell
+            return False
+
+        occupied = 0
+        for cell in cells:
+            occupied |= 1 << cell
+        solution = None
+        try:
+            for depth in range(min_depth, max_depth + 1):
+                self.depth = depth
+                if search(cells, occupied, depth):
+                    solution = [(colors[i], DIRECTIONS[d]) for i, d in reversed(path)]
+                    break
+        except OutOfTime:
+            self.timed_out = True
+        # Keep track of how many different positions were looked at
+        self.nodes = len(seen)
+        return solution
+
+
+
+def solve(board, goal=None, max_depth=DEFAULT_MAX_DEPTH):
+    # Return a shortest list of (color, direction) moves that gets a robot
+    # from where the robots are now to the goal, or None if there isn't one
+    # within max_depth moves.
+    return Solver(board).solve(goal, max_depth=max_depth)
+
+
+
+# Generate and solve boards without a display, for trying out board sizes
+# and numbers of robots
+
+if __name__ == '__main__':
+    import sys
+    import time
+    import argparse
+    from board import Board, DEFAULT_BOARD_SIZE, COLORS, ALL_COLORS
+    parser = argparse.ArgumentParser(description='Generate and solve random Ricochet Robots boards.')
+    parser.add_argument('n', type=int, help='number of boards')
+    parser.add_argument('--seed', type=int, default=None)
+    parser.add_argument('--size', type=int, nargs=2, default=DEFAULT_BOARD_SIZE)
+    parser.add_argument('--robots', type=int, default=len(COLORS), choices=range(1, len(ALL_COLORS) + 1),
+                        help='number of robots')
+    parser.add_argument('--max-depth', type=int, default=DEFAULT_MAX_DEPTH)
+    args = parser.parse_args()
+    board = Board(tuple(args.size), ALL_COLORS[:args.robots], seed=args.seed, randomize=False)
+    solved = moves = nodes = 0
+    start = time.time()
+    for i in range(args.n):
+        board.reset_game()
+        goal = board.draw()
+        solver = Solver(board)
+        solution = solver.solve(goal, max_depth=args.max_depth)
+        nodes += solver.nodes
+        if solution is None:
+            sys.stdout.write('%d: %s %s: no solution within %d moves\n' % (i, goal[0], goal[1], args.max_depth))
+        else:
+            solved += 1
+            moves += len(solution)
+            sys.stdout.write('%d: %s %s: %d moves: %s\n' % (i, goal[0], goal[1], len(solution),
+                             ' '.join(['%s-%s' % move for move in solution])))
+    elapsed = time.time() - start
+    sys.stderr.write('%d of %d solved, %.1f moves on average, %d positions, %.2fs\n'
+                     % (solved, args.n, float(moves) / max(solved, 1), nodes, elapsed))
@@ -0,0 +1,129 @@
+# Ricochet Robots instrumentation
+
+# Counters and timing histograms for the hot paths of the game, for finding
+# out where the time goes on slow machines. Nothing is recorded unless it's
+# turned on, either with Game(stats=...) or by setting the RICOCHET_STATS
+# environment variable to the number of seconds between dumps. The dumps go
+# to stderr, or are appended to the file named by RICOCHET_STATS_FILE.
+#
+# Code that records stats holds None instead of a Stats when they're off,
+# and checks for that before timing anything, so turning them off costs one
+# test per hook.
+
+import os
+import sys
+import time
+
+
+DEFAULT_DUMP_SECONDS = 10.0
+ENVIRONMENT_VARIABLE = 'RICOCHET_STATS'
+FILE_VARIABLE = 'RICOCHET_STATS_FILE'
+
+
+
+class Histogram(object):
+
+    # Counts values in power-of-two buckets: bucket 0 holds values under 1
+    # (after scaling), bucket 1 holds 1 up to 2, bucket 2 holds 2 up to 4,
+    # and so on. Times are recorded in seconds and shown in microseconds.
+
+    def __init__(self, scale=1.0, unit=''):
+        self.scale = scale
+        self.unit = unit
+        self.buckets = []
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def add(self, value):
+        value *= self.scale
+        i = int(value).bit_length()
+        if i >= len(self.buckets):
+            self.buckets.extend([0] * (i + 1 - len(self.buckets)))
+        self.buckets[i] += 1
+        self.count += 1
+        self.total += value
+        if value > self.max:
+            self.max = value
+
+    def percentile(self, p):
+        # Return the upper edge of the bucket that holds the p'th percentile
+        n = 0
+        for i, count in enumerate(self.buckets):
+            n += count
+            if n >= p * self.count:
+                return 1 << i
+        return 0
+
+    def format(self):
+        if not self.count:
+            return 'n=0'
+        return 'n=%d mean=%.2f%s max=%.2f%s p50<%d p90<%d p99<%d' % (
+            self.count, self.total / self.count, self.unit, self.max, self.unit,
+            self.percentile(.5), self.percentile(.9), self.percentile(.99))
+
+
+
+class Stats(object):
+
+    def __init__(self, interval=DEFAULT_DUMP_SECONDS, out=None):
+        # interval is the number of seconds between dumps, for whoever is
+        # doing the dumping. out is a file to write them to (default stderr).
+        self.interval = interval
+        self.out = out
+        self.counters = {}
+        self.histograms = {}
+        self.gauges = {}
+        self.start = time.time()
+
+    @classmethod
+    def from_environment(cls):
+        # Return a Stats set up by the environment variables, or None if
+        # they don't turn stats on. Anything but a positive, finite number
+        # of seconds leaves them off, so that setting it to 0 does what it
+        # says.
+        value = os.environ.get(ENVIRONMENT_VARIABLE)
+        if not value:
+            return None
+        try:
+            interval = float(value)
+        except ValueError:
+            return None
+        if not 0 < interval < float('inf'):
+            return None
+        path = os.environ.get(FILE_VARIABLE)
+        return cls(interval, open(path, 'a') if path else None)
+
+    def count(self, name, n=1):
+        self.counters[name] = self.counters.get(name, 0) + n
+
+    def record(self, name, value, scale=1.0, unit=''):
+        # Add a value to the named histogram
+        histogram = self.histograms.get(name)
+        if histogram is None:
+            histogram = self.histograms[name] = Histogram(scale, unit)
+        histogram.add(value)
+
+    def record_time(self, name, seconds):
+        self.record(name, seconds, 1e6, 'us')
+
+    def gauge(self, name, value):
+        # Remember the latest value of something, like how many items there
+        # are on the canvas
+        self.gauges[name] = value
+
+    def format(self):
+        # Return everything recorded so far as text
+        lines = ['stats after %.1fs' % (time.time() - self.start)]
+        for name in sorted(self.counters):
+            lines.append('  %-20s %d' % (name, self.counters[name]))
+        for name in sorted(self.gauges):
+            lines.append('  %-20s %s' % (name, self.gauges[name]))
+        for name in sorted(self.histograms):
+            lines.append('  %-20s %s' % (name, self.histograms[name].format()))
+        return '\n'.join(lines) + '\n'
+
+    def dump(self):
+        out = self.out or sys.stderr
+        out.write(self.format())
+        out.flush()
@@ -0,0 +1,94 @@
+# Ricochet Robots solution checking
+
+# Plays claimed solutions out on a board without touching the board itself,
+# its undo stack or any display. Everything that depends only on the walls
+# is worked out once per board, so checking many solutions to the same
+# board only costs the moves themselves.
+
+from board import DIRECTIONS
+from bitboard import BitBoard
+
+
+
+class Verifier(object):
+
+    def __init__(self, board):
+        self.board = board
+        self.bitboard = bitboard = BitBoard.from_board(board)
+        self.colors = board.colors
+        self.robot_index = dict([(color, i) for i, color in enumerate(board.colors)])
+        # (stops, rays, delta) for each direction, by name
+        self.moves = dict([(direction, (bitboard.stops[d], bitboard.rays[d], bitboard.deltas[d]))
+                           for d, direction in enumerate(DIRECTIONS)])
+
+
+    def verify(self, moves, goal=None, robots=None):
+        # Play a list of (color, direction) moves from the given robot
+        # positions (by default where the robots are on the board now).
+        # Return whether they end with the goal met (by default the board's
+        # current goal), how many moves were played and where the robots
+        # ended up, keyed by color. Moves that don't go anywhere still count,
+        # as they do in the game. An unknown color or direction makes the
+        # solution invalid, and stops it there.
+        board = self.board
+        bitboard = self.bitboard
+        if goal is None:
+            goal = board.goal
+        if robots is None:
+            robots = board.robots
+        cells = [bitboard.cell(robots[color]) for color in self.colors]
+        occupied = 0
+        for cell in cells:
+            occupied |= 1 << cell
+        robot_index = self.robot_index
+        table = self.moves
+        count = 0
+        valid = True
+        for color, direction in moves:
+            i = robot_index.get(color)
+            move = table.get(direction)
+            if i is None or move is None:
+                valid = False
+                break
+            stops, rays, delta = move
+            cell = cells[i]
+            # Stop short of the nearest robot in the way, if any
+            blockers = rays[cell] & occupied
+            if not blockers:
+                end = stops[cell]
+            elif delta > 0:
+                end = (blockers & -blockers).bit_length() - 1 - delta
+            else:
+                end = blockers.bit_length() - 1 - delta
+            occupied ^= (1 << cell) ^ (1 << end)
+            cells[i] = end
+            count += 1
+        if valid:
+            if goal is None:
+                valid = False
+            else:
+                target = bitboard.cell(board.targets[goal])
+                if goal[0] == 'wild':
+                    valid = target in cells
+                else:
+                    valid = cells[robot_index[goal[0]]] == target
+        positions = dict([(color, bitboard.pos(cell)) for color, cell in zip(self.colors, cells)])
+        return valid, count, positions
+
+
+    def verify_batch(self, submissions, goal=None, robots=None):
+        # Verify a list of move lists, all from the same starting position.
+        # Return a list of results in the same form as verify().
+        return [self.verify(moves, goal, robots) for moves in submissions]
+
+
+
+def verify(board, moves, goal=None, robots=None):
+    # Check one solution on a board. See Verifier.verify().
+    return Verifier(board).verify(moves, goal, robots)
+
+
+def verify_batch(board, submissions, goal=None, robots=None):
+    # Check many solutions to the same board, sharing the work that only
+    # depends on the walls. See Verifier.verify().
+    return Verifier(board).verify_batch(submissions, goal, robots)